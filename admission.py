@@ -0,0 +1,110 @@
+# Admission control for renders. Each render holds a share of a per-process
+# budget sized by its estimated cost (see render.render_cost). When the
+# budget is spent, requests wait in a short queue; past its length or its
+# wait limit they are turned away with a 503 and a Retry-After, so clients
+# back off instead of piling up behind busy workers until they time out.
+import select
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import RENDER_CANCELLED, RENDER_QUEUE_SECONDS, RENDER_REJECTED
+
+# How often a queued request looks at its client while it waits
+POLL_SECONDS = 0.1
+# Costs are kept as integer hundredths, so admits and releases in any order
+# add back up to exactly zero
+COST_SCALE = 100
+
+
+class Overloaded(RuntimeError):
+    status = 503
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ClientGone(RuntimeError):
+    pass
+
+
+def socket_connected(sock):
+    # True unless the peer has closed the connection. A readable socket with
+    # nothing to read is at EOF; select first, so a socket with a timeout
+    # never blocks in recv.
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        return not readable or sock.recv(1, socket.MSG_PEEK) != b''
+    except (OSError, ValueError):
+        return False
+
+
+class RenderGate:
+    def __init__(self, capacity=6.0, max_waiting=8, max_wait=2.0, retry_after=2):
+        self.capacity = capacity
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self._capacity = round(capacity * COST_SCALE)
+        self._in_use = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    @property
+    def in_use(self):
+        return self._in_use / COST_SCALE
+
+    @property
+    def waiting(self):
+        return self._waiting
+
+    @contextmanager
+    def admit(self, cost, connected=None):
+        # `connected()` says whether the client is still there; renders for
+        # clients that left are dropped before they start. The largest
+        # renders run alone rather than never.
+        cost = min(round(cost * COST_SCALE), self._capacity)
+        if connected and not connected():
+            RENDER_CANCELLED.inc(stage='arrival')
+            raise ClientGone("cliente desconectado")
+        self._acquire(cost, connected)
+        try:
+            if connected and not connected():
+                RENDER_CANCELLED.inc(stage='admitted')
+                raise ClientGone("cliente desconectado")
+            yield
+        finally:
+            self._release(cost)
+
+    def _acquire(self, cost, connected):
+        with self._cond:
+            if self._in_use + cost <= self._capacity:
+                self._in_use += cost
+                return
+            if self._waiting >= self.max_waiting:
+                RENDER_REJECTED.inc(reason='queue_full')
+                raise Overloaded("Servidor ocupado, tente novamente em instantes", self.retry_after)
+
+            self._waiting += 1
+            started = time.monotonic()
+            try:
+                while self._in_use + cost > self._capacity:
+                    remaining = started + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        RENDER_REJECTED.inc(reason='timeout')
+                        raise Overloaded("Servidor ocupado, tente novamente em instantes", self.retry_after)
+                    self._cond.wait(min(remaining, POLL_SECONDS))
+                    if connected and not connected():
+                        RENDER_CANCELLED.inc(stage='queue')
+                        raise ClientGone("cliente desconectado")
+                self._in_use += cost
+            finally:
+                self._waiting -= 1
+                RENDER_QUEUE_SECONDS.observe(time.monotonic() - started)
+
+    def _release(self, cost):
+        with self._cond:
+            self._in_use -= cost
+            self._cond.notify_all()
@@ -1,505 +1,421 @@
-import os
-from flask import Flask, request, send_file, render_template
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.units import cm
-from PIL import Image, ImageDraw
+from flask import Flask, request, send_file, render_template, abort, Response, jsonify, url_for, g
+from werkzeug.exceptions import HTTPException
 import io
-from werkzeug.utils import secure_filename
-from reportlab.pdfbase.pdfmetrics import stringWidth
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import Paragraph
-from reportlab.lib.enums import TA_LEFT, TA_JUSTIFY
+import logging
+import os
+import threading
+import time
+import unicodedata
+from dataclasses import replace
+from functools import lru_cache
+from urllib.parse import quote
+from assets import Precompressed, StaticAssets
+from cache_store import TieredCache
+from render import (MAX_PHOTO_BYTES, PhotoRejected, photo_store, parse_form_data,
+                    resume_cache_key, download_name, render_pdf, get_colors, palette_css,
+                    section_layout, fit_name, COLOR_PALETTES, render_palettes, render_palette_sheet, render_cost)
+from admission import RenderGate, Overloaded, ClientGone, socket_connected
+from model import Resume, ResumeError
+from batch import MAX_BATCH_BYTES, BatchError, read_records, load_photo, render_batch, shared_pool, stream_zip
+from jobs import JobStore, JobQueue, QueueFull
+from metrics import (REGISTRY, REQUESTS, REQUEST_SECONDS, STAGE_SECONDS, BYTES_OUT, STARTUP_SECONDS,
+                     cache_collector, admission_collector, clear_process_files)
+
+# Debug output is opt-in: LOG_LEVEL=DEBUG gunicorn app:app
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'WARNING').upper(),
+                    format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-UPLOAD_FOLDER = 'static/uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
-PAGE_WIDTH, PAGE_HEIGHT = A4
-SIDEBAR_WIDTH = 6*cm
-CONTENT_WIDTH = PAGE_WIDTH - SIDEBAR_WIDTH - 2*cm
-MARGIN_TOP = PAGE_HEIGHT - 2*cm
-MARGIN_BOTTOM = 2*cm
-LINE_HEIGHT = 16
-
-COLOR_PALETTES = {
-    'professional': {
-        'primary': colors.HexColor("#dc2626"),      # Professional red
-        'secondary': colors.HexColor("#f59e0b"),    # Warm yellow accent
-        'text': colors.HexColor("#374151"),         # Dark gray text
-        'light_bg': colors.HexColor("#fef2f2"),     # Light pink background
-        'white': colors.white,
-        'border': colors.HexColor("#e5e7eb"),       # Light border
-        'muted': colors.HexColor("#6b7280")         # Muted gray
-    },
-    'corporate': {
-        'primary': colors.HexColor("#1e40af"),      # Corporate blue
-        'secondary': colors.HexColor("#0891b2"),    # Cyan accent
-        'text': colors.HexColor("#374151"),         # Dark gray text
-        'light_bg': colors.HexColor("#eff6ff"),     # Light blue background
-        'white': colors.white,
-        'border': colors.HexColor("#e5e7eb"),       # Light border
-        'muted': colors.HexColor("#6b7280")         # Muted gray
-    },
-    'modern': {
-        'primary': colors.HexColor("#7c3aed"),      # Modern purple
-        'secondary': colors.HexColor("#06b6d4"),    # Bright cyan
-        'text': colors.HexColor("#374151"),         # Dark gray text
-        'light_bg': colors.HexColor("#f3f4f6"),     # Light gray background
-        'white': colors.white,
-        'border': colors.HexColor("#e5e7eb"),       # Light border
-        'muted': colors.HexColor("#6b7280")         # Muted gray
-    },
-    'elegant': {
-        'primary': colors.HexColor("#059669"),      # Elegant green
-        'secondary': colors.HexColor("#d97706"),    # Warm orange
-        'text': colors.HexColor("#374151"),         # Dark gray text
-        'light_bg': colors.HexColor("#f0fdf4"),     # Light green background
-        'white': colors.white,
-        'border': colors.HexColor("#e5e7eb"),       # Light border
-        'muted': colors.HexColor("#6b7280")         # Muted gray
-    }
-}
+app.config['MAX_CONTENT_LENGTH'] = MAX_PHOTO_BYTES + 1024 * 1024
+# /api/gerar carries the photo as base64, 4 bytes for every 3
+API_MAX_CONTENT_LENGTH = 4 * -(-MAX_PHOTO_BYTES // 3) + 1024 * 1024
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.',1)[1].lower() in ALLOWED_EXTENSIONS
 
-def create_circle_image(image_path):
-    img = Image.open(image_path).convert("RGBA")
-    size = (200, 200)  # Larger photo for better impact
-    img = img.resize(size)
-    mask = Image.new('L', size, 0)
-    draw = ImageDraw.Draw(mask)
-    draw.ellipse((0,0)+size, fill=255)
-    img.putalpha(mask)
-    
-    output = Image.new('RGBA', size, (0, 0, 0, 0))
-    output.paste(img, (0, 0), img)
-    
-    temp_path = os.path.join(UPLOAD_FOLDER, "temp_circle.png")
-    output.save(temp_path)
-    return temp_path
-
-def draw_wrapped_text(pdf, text, x, y, max_width, font_name="Helvetica", font_size=11, line_height=16, color=None, colors_palette=None):
-    COLORS = colors_palette or get_colors()
-    if color is None:
-        color = COLORS['text']
-        
-    paragraphs = text.split("\n")
-    pdf.setFont(font_name, font_size)
-    pdf.setFillColor(color)
-    
-    for para in paragraphs:
-        if not para.strip():
-            y -= line_height * 0.5
-            continue
-            
-        words = para.split()
-        line = ""
-        for word in words:
-            test_line = f"{line} {word}".strip()
-            if stringWidth(test_line, font_name, font_size) > max_width:
-                if line:
-                    y -= line_height
-                    if y < MARGIN_BOTTOM:
-                        pdf.showPage()
-                        draw_sidebar(pdf, foto_path=None, data=None, colors_palette=COLORS)
-                        y = MARGIN_TOP
-                        pdf.setFont(font_name, font_size)
-                        pdf.setFillColor(color)
-                    pdf.drawString(x, y, line)
-                line = word
-            else:
-                line = test_line
-        
-        if line:
-            y -= line_height
-            if y < MARGIN_BOTTOM:
-                pdf.showPage()
-                draw_sidebar(pdf, foto_path=None, data=None, colors_palette=COLORS)
-                y = MARGIN_TOP
-                pdf.setFont(font_name, font_size)
-                pdf.setFillColor(color)
-            pdf.drawString(x, y, line)
-    
-    return y
-
-def draw_wrapped_text_sidebar(pdf, text, x, y, max_width, font_name="Helvetica", font_size=10, line_height=14, colors_palette=None):
-    COLORS = colors_palette or get_colors()
-    
-    pdf.setFont(font_name, font_size)
-    pdf.setFillColor(COLORS['white'])
-    words = text.split()
-    line = ""
-    for word in words:
-        test_line = f"{line} {word}".strip()
-        if stringWidth(test_line, font_name, font_size) > max_width:
-            if line:
-                y -= line_height
-                pdf.drawString(x, y, line)
-            line = word
-        else:
-            line = test_line
-    if line:
-        y -= line_height
-        pdf.drawString(x, y, line)
-    return y
-
-def draw_sidebar(pdf, foto_path=None, data=None, colors_palette=None):
-    COLORS = colors_palette or get_colors()
-    
-    # Main sidebar background
-    pdf.setFillColor(COLORS['text'])
-    pdf.rect(0, 0, SIDEBAR_WIDTH, PAGE_HEIGHT, fill=1)
-    
-    # Red accent stripe
-    pdf.setFillColor(COLORS['primary'])
-    pdf.rect(0, 0, 0.4*cm, PAGE_HEIGHT, fill=1)
-    
-    y = PAGE_HEIGHT - 1.5*cm
-
-    # Photo section with elegant frame
-    if foto_path:
-        # Red border around photo only
-        pdf.setStrokeColor(COLORS['primary'])
-        pdf.setLineWidth(3)
-        pdf.circle(SIDEBAR_WIDTH/2, y-2.8*cm, 2.0*cm, fill=0)
-        
-        pdf.drawImage(foto_path, SIDEBAR_WIDTH/2-1.8*cm, y-4.6*cm, width=3.6*cm, height=3.6*cm, mask='auto')
-        y -= 6*cm
-    else:
-        y -= 1*cm
-
-    if data and data.get('nome'):
-        pdf.setFillColor(COLORS['white'])
-        
-        # Start with larger font and reduce if needed
-        font_size = 18
-        max_width = SIDEBAR_WIDTH - 1*cm
-        
-        # Check if name fits in one line
-        name_width = stringWidth(data['nome'], "Helvetica-Bold", font_size)
-        
-        if name_width <= max_width:
-            # Name fits in one line - center it
-            pdf.setFont("Helvetica-Bold", font_size)
-            pdf.drawString((SIDEBAR_WIDTH - name_width)/2, y, data['nome'])
-            y -= 2*cm
-        else:
-            # Name is too long - try smaller font first
-            while name_width > max_width and font_size > 12:
-                font_size -= 1
-                name_width = stringWidth(data['nome'], "Helvetica-Bold", font_size)
-            
-            if name_width <= max_width:
-                # Smaller font works - center it
-                pdf.setFont("Helvetica-Bold", font_size)
-                pdf.drawString((SIDEBAR_WIDTH - name_width)/2, y, data['nome'])
-                y -= 2*cm
-            else:
-                # Even small font doesn't work - split into lines intelligently
-                pdf.setFont("Helvetica-Bold", 14)  # Use readable font size
-                words = data['nome'].split()
-                
-                if len(words) <= 2:
-                    # Two words or less - put each on separate line
-                    for word in words:
-                        word_width = stringWidth(word, "Helvetica-Bold", 14)
-                        pdf.drawString((SIDEBAR_WIDTH - word_width)/2, y, word)
-                        y -= 0.8*cm
-                    y -= 1.2*cm
-                else:
-                    # Multiple words - group intelligently
-                    lines = []
-                    current_line = ""
-                    
-                    for word in words:
-                        test_line = f"{current_line} {word}".strip()
-                        if stringWidth(test_line, "Helvetica-Bold", 14) <= max_width:
-                            current_line = test_line
-                        else:
-                            if current_line:
-                                lines.append(current_line)
-                            current_line = word
-                    
-                    if current_line:
-                        lines.append(current_line)
-                    
-                    # Draw each line centered
-                    for line in lines:
-                        line_width = stringWidth(line, "Helvetica-Bold", 14)
-                        pdf.drawString((SIDEBAR_WIDTH - line_width)/2, y, line)
-                        y -= 0.8*cm
-                    y -= 1.2*cm
-
-    # Contact section with modern styling
-    if data:
-        y -= 0.5*cm
-        
-        # Section header with red background
-        pdf.setFillColor(COLORS['primary'])
-        pdf.rect(0.3*cm, y-0.3*cm, SIDEBAR_WIDTH-0.6*cm, 0.8*cm, fill=1)
-        
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.setFillColor(COLORS['white'])
-        pdf.drawString(0.7*cm, y, "CONTATO")
-        y -= 1.2*cm
-        
-        # Contact items with better spacing and icons
-        contact_items = [
-            ('email', data.get('email')),
-            ('telefone', data.get('telefone')),
-            ('endereco', data.get('endereco')),
-            ('linkedin', data.get('linkedin')),
-            ('github', data.get('github'))
-        ]
-        
-        for key, value in contact_items:
-            if value:
-                # Small yellow accent dot
-                pdf.setFillColor(COLORS['secondary'])
-                pdf.circle(0.7*cm, y+0.15*cm, 0.08*cm, fill=1)
-                
-                pdf.setFont("Helvetica", 9)
-                pdf.setFillColor(COLORS['white'])
-                pdf.drawString(1.2*cm, y, value)
-                y -= 0.7*cm
-
-def draw_section_header(pdf, title, y, x=None, colors_palette=None):
-    COLORS = colors_palette or get_colors()
-    
-    if x is None:
-        x = SIDEBAR_WIDTH + 1*cm
-    
-    # Title text in primary color
-    pdf.setFont("Helvetica-Bold", 14)
-    pdf.setFillColor(COLORS['primary'])
-    pdf.drawString(x, y, title)
-    
-    # Horizontal line below title
-    pdf.setStrokeColor(COLORS['primary'])
-    pdf.setLineWidth(1)
-    title_width = stringWidth(title, "Helvetica-Bold", 14)
-    pdf.line(x, y-0.3*cm, x + title_width + 1*cm, y-0.3*cm)
-    
-    return y - 1*cm
-
-def draw_experience_item(pdf, experience_text, x, y, max_width, colors_palette=None):
-    COLORS = colors_palette or get_colors()
-    
-    parts = experience_text.strip().split('|')
-    if len(parts) >= 2:
-        position = parts[0].strip()
-        company_period = ' | '.join(parts[1:]).strip()
-        
-        # Position title in red
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.setFillColor(COLORS['primary'])
-        y = draw_wrapped_text(pdf, position, x, y, max_width, font_name="Helvetica-Bold", font_size=12, color=COLORS['primary'], colors_palette=COLORS)
-        
-        # Company and period in smaller text
-        pdf.setFont("Helvetica", 10)
-        pdf.setFillColor(COLORS['muted'])
-        y = draw_wrapped_text(pdf, company_period, x, y, max_width, font_name="Helvetica", font_size=10, color=COLORS['muted'], colors_palette=COLORS)
-        
-        # Subtle separator line
-        pdf.setStrokeColor(COLORS['border'])
-        pdf.setLineWidth(0.5)
-        pdf.line(x, y-0.3*cm, x+max_width*0.3, y-0.3*cm)
-        
-    return y - 0.8*cm
+def read_photo_upload(file):
+    # Read one byte past the limit so oversized uploads are caught without buffering them whole
+    data = file.stream.read(MAX_PHOTO_BYTES + 1)
+    if len(data) > MAX_PHOTO_BYTES:
+        raise PhotoRejected(f"Foto maior que {MAX_PHOTO_BYTES // (1024 * 1024)} MB")
+    return data
+
+# Finished PDFs, shared by all workers through the disk tier. Cached
+# documents above PDF_MEMORY_ENTRY_BYTES stay on disk and are sent from the
+# cache file; a fresh render is always whole in memory, since ReportLab
+# builds the complete document before canvas.save writes any of it.
+PDF_CACHE_FOLDER = 'cache/pdf'
+PDF_MEMORY_ENTRY_BYTES = 1024 * 1024
+pdf_cache = TieredCache(PDF_CACHE_FOLDER, suffix='.pdf', memory_items=128,
+                        memory_bytes=64 * 1024 * 1024, disk_bytes=512 * 1024 * 1024,
+                        memory_entry_bytes=PDF_MEMORY_ENTRY_BYTES)
+
+# Render admission, per worker process. Costs are render_cost units of about
+# 10 ms of CPU. gunicorn.conf.py runs threaded workers with more threads than
+# the budget admits, so excess requests reach the queue and the 503 path.
+RENDER_CAPACITY = float(os.environ.get('RENDER_CAPACITY', 6))
+RENDER_MAX_WAITING = int(os.environ.get('RENDER_MAX_WAITING', 8))
+RENDER_MAX_WAIT = float(os.environ.get('RENDER_MAX_WAIT', 2))
+RENDER_RETRY_AFTER = int(os.environ.get('RENDER_RETRY_AFTER', 2))
+render_gate = RenderGate(RENDER_CAPACITY, RENDER_MAX_WAITING, RENDER_MAX_WAIT, RENDER_RETRY_AFTER)
+# Batch ZIPs streaming at once per worker; all of them share the batch pool
+MAX_BATCHES = int(os.environ.get('MAX_BATCHES', 2))
+batch_slots = threading.BoundedSemaphore(MAX_BATCHES)
+
+# Async render jobs: any worker can report on a job, the accepting worker renders it
+JOBS_DB = 'cache/jobs.sqlite3'
+JOB_TTL = 3600
+def render_job(data, photo_bytes):
+    # Jobs store the resume as its JSON form
+    resume = Resume.from_json(data)
+    return render_cached(resume, photo_bytes)[1], download_name(resume)
+
+job_queue = JobQueue(JobStore(JOBS_DB, ttl=JOB_TTL), render_job, workers=2, max_pending=16)
+
+REGISTRY.collector(cache_collector({'pdf': pdf_cache, 'photo': photo_store.circles,
+                                    'photo_compact': photo_store.compacts, 'layout': section_layout,
+                                    'name_layout': fit_name}))
+REGISTRY.collector(admission_collector(render_gate))
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+first_request_seen = False
+
+@app.after_request
+def record_request(response):
+    global first_request_seen
+    endpoint = request.endpoint or 'unknown'
+    REQUESTS.inc(endpoint=endpoint, status=str(response.status_code))
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+        if not first_request_seen:
+            # Reported per worker, to compare cold and preloaded startup
+            first_request_seen = True
+            STARTUP_SECONDS.set(elapsed, phase='first_request')
+            logger.info("First request in worker %d (%s) took %.1f ms", os.getpid(), endpoint, elapsed * 1000)
+    REGISTRY.save()
+    return response
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    headers = {'Retry-After': str(e.retry_after)}
+    if request.path.startswith('/api/'):
+        return jsonify(erro=str(e)), e.status, headers
+    return Response(str(e), status=e.status, mimetype='text/plain', headers=headers)
+
+@app.errorhandler(HTTPException)
+def http_error(e):
+    # The API promises JSON bodies, aborts included; other pages keep
+    # Flask's HTML error pages
+    if request.path.startswith('/api/'):
+        headers = [(name, value) for name, value in e.get_headers() if name != 'Content-Type']
+        return jsonify(erro=e.description), e.code, headers
+    return e
+
+@app.errorhandler(ClientGone)
+def client_gone(e):
+    # Nobody is reading the response; 499 only shows up in logs and metrics
+    return Response(status=499)
+
+def client_connected():
+    # Checks the client socket gunicorn puts in the environ; servers that
+    # don't expose it (the dev server, the test client) always count as
+    # connected
+    sock = request.environ.get('gunicorn.socket')
+    return lambda: sock is None or socket_connected(sock)
+
+class TimedFile:
+    # File proxy that records how long the body took to send. WSGI servers
+    # close the file when the response is done; fileno is kept so sendfile
+    # still works.
+    def __init__(self, f, stage='send'):
+        self._f = f
+        self._stage = stage
+        self._started = time.perf_counter()
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def close(self):
+        if not self._f.closed:
+            STAGE_SECONDS.observe(time.perf_counter() - self._started, stage=self._stage)
+        self._f.close()
+
+def file_size(f):
+    f.seek(0, io.SEEK_END)
+    size = f.tell()
+    f.seek(0)
+    return size
+
+# Static files under fingerprinted names; a changed file gets a new URL, so
+# the old one can be cached forever
+static_assets = StaticAssets(app.static_folder)
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# The form page is revalidated on every visit (a 304 when unchanged), so a
+# deploy is picked up at once together with the asset URLs it points at
+FORM_CACHE_CONTROL = 'public, no-cache'
+
+@app.template_global()
+def asset_url(name):
+    return url_for('asset', name=static_assets.hashed_name(name))
+
+def counted(chunks):
+    # Streamed bodies (the ZIPs) count towards BYTES_OUT as they are sent
+    for chunk in chunks:
+        BYTES_OUT.inc(len(chunk))
+        yield chunk
+
+def set_attachment(response, filename):
+    # Content-Disposition as send_file writes it: quoted, with an RFC 5987
+    # filename* for names that don't fit in ASCII
+    try:
+        filename.encode('ascii')
+        names = {'filename': filename}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple, 'filename*': "UTF-8''" + quote(filename, safe="!#$&+^`|~")}
+    response.headers.set('Content-Disposition', 'attachment', **names)
+    return response
+
+def send_precompressed(body, cache_control):
+    encoding = body.choose(request.accept_encodings)
+    etag = body.etag(encoding)
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+    if etag in request.if_none_match:
+        return Response(status=304, headers=headers)
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(body.variants[encoding], mimetype=body.mimetype, headers=headers)
+
+@app.route('/assets/<name>')
+def asset(name):
+    body = static_assets.get(name)
+    if body is None:
+        abort(404)
+    return send_precompressed(body, ASSET_CACHE_CONTROL)
+
+@lru_cache(maxsize=1)
+def form_page():
+    # The form has no per-request content: rendered and compressed once per worker
+    return Precompressed(render_template('form.html').encode('utf-8'), 'text/html')
 
 @app.route('/')
 def form():
-    return render_template('form.html')
+    if app.debug:
+        # Template edits show up without a restart while developing
+        form_page.cache_clear()
+    return send_precompressed(form_page(), FORM_CACHE_CONTROL)
+
+# The preview is re-rendered on every pause in typing, so its template is
+# compiled once and kept rather than looked up per request
+PREVIEW_TEMPLATE = app.jinja_env.get_template('curriculo.html')
+
+@app.route('/preview', methods=['POST'])
+def preview():
+    # HTML rendition of the same section model the PDF is drawn from; the
+    # photo is left out so the form can post on every keystroke pause
+    with STAGE_SECONDS.time(stage='preview'):
+        resume = parse_form_data(request.form)
+        html = PREVIEW_TEMPLATE.render(
+            contact=resume.contact,
+            sections=resume.sections(),
+            cores=palette_css(get_colors(resume.paleta or 'professional')))
+    return Response(html, mimetype='text/html')
+
+def read_form_photo():
+    file = request.files.get('foto')
+    if not (file and allowed_file(file.filename)):
+        return None
+    try:
+        return read_photo_upload(file)
+    except PhotoRejected as e:
+        abort(e.status, description=str(e))
+
+def render_cached(resume, photo_bytes=None, etag=None):
+    etag = etag or resume_cache_key(resume, photo_store.digest(photo_bytes) if photo_bytes else '')
+    pdf_bytes = pdf_cache.get(etag)
+    if pdf_bytes is None:
+        pdf_bytes = render_pdf(resume, photo_bytes)
+        pdf_cache.put(etag, pdf_bytes)
+    return etag, pdf_bytes
+
+def open_rendered(resume, photo_bytes, etag):
+    # Returns a file object for the finished PDF: the cached entry (the cache
+    # file on disk for large ones) or the fresh render
+    cached = pdf_cache.open(etag)
+    if cached is not None:
+        return cached
+    with render_gate.admit(render_cost(resume, photo_bytes), client_connected()):
+        pdf_bytes = render_pdf(resume, photo_bytes)
+    pdf_cache.put(etag, pdf_bytes)
+    return io.BytesIO(pdf_bytes)
+
+def precondition_failed(etag):
+    # A matching If-None-Match on a POST: clients that keep the PDF (browsers
+    # never send it on form posts) learn that their copy is current. 304 is
+    # only for GET and HEAD; other methods get 412 (RFC 9110, 13.1.2).
+    return Response(status=412, headers={'ETag': f'"{etag}"'})
+
+def send_resume(resume, photo_bytes):
+    # The PDF response shared by /gerar and /api/gerar, with the cache key as ETag
+    etag = resume_cache_key(resume, photo_store.digest(photo_bytes) if photo_bytes else '')
+    if etag in request.if_none_match:
+        return precondition_failed(etag)
+
+    try:
+        pdf_file = open_rendered(resume, photo_bytes, etag)
+    except PhotoRejected as e:
+        abort(e.status, description=str(e))
+    size = file_size(pdf_file)
+    BYTES_OUT.inc(size)
+
+    response = send_file(TimedFile(pdf_file), as_attachment=True, download_name=download_name(resume),
+                         mimetype='application/pdf', etag=etag)
+    response.content_length = size
+    return response
 
 @app.route('/gerar', methods=['POST'])
 def gerar():
-    data = {}
-    campos = ['nome','email','telefone','endereco','linkedin','github',
-              'resumo','habilidades','escolaridade','cursos','certificacoes','projetos','paleta']
-    for campo in campos:
-        data[campo] = request.form.get(campo, '')
-
-    experiencias = []
-    i = 1
-    while True:
-        empresa = request.form.get(f'empresa{i}', '').strip()
-        cargo = request.form.get(f'cargo{i}', '').strip()
-        periodo = request.form.get(f'periodo{i}', '').strip()
-        responsabilidades = request.form.get(f'responsabilidades{i}', '').strip()
-        conquistas = request.form.get(f'conquistas{i}', '').strip()
-        
-        # If no data for this experience, stop looking for more
-        if not (empresa or cargo or responsabilidades or conquistas):
-            break
-            
-        if empresa or cargo:  # If at least company or position is filled
-            exp_text = ""
-            if empresa and cargo and periodo:
-                exp_text += f"{empresa} - {cargo} ({periodo})\n"
-            elif empresa and cargo:
-                exp_text += f"{empresa} - {cargo}\n"
-            elif empresa:
-                exp_text += f"{empresa}\n"
-            
-            if responsabilidades:
-                # Split responsibilities by lines and add bullets
-                resp_lines = [line.strip() for line in responsabilidades.split('\n') if line.strip()]
-                for resp in resp_lines:
-                    if not resp.startswith('•'):
-                        exp_text += f"• {resp}\n"
-                    else:
-                        exp_text += f"{resp}\n"
-            
-            if conquistas:
-                # Split achievements by lines and add bullets
-                conq_lines = [line.strip() for line in conquistas.split('\n') if line.strip()]
-                for conq in conq_lines:
-                    if not conq.startswith('•'):
-                        exp_text += f"• {conq}\n"
-                    else:
-                        exp_text += f"{conq}\n"
-            
-            if exp_text:
-                experiencias.append(exp_text.strip())
-        
-        i += 1
-    
-    # Join all experiences with double newlines
-    data['experiencia'] = '\n\n'.join(experiencias)
-
-    print(f"[DEBUG] Processed {len(experiencias)} dynamic experiences")
-    print(f"[DEBUG] Final experiencia data: '{data['experiencia'][:100]}...'")
-
-    foto_path = None
-    if 'foto' in request.files:
-        file = request.files['foto']
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            foto_path = create_circle_image(filepath)
-
-    buffer = io.BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
-    
-    pdf.setTitle(f"Currículo Profissional - {data.get('nome', 'Candidato')}")
-    pdf.setAuthor(data.get('nome', ''))
-    pdf.setSubject("Currículo Profissional - Desenvolvido com Design Moderno")
-
-    selected_palette = data.get('paleta', 'professional')
-    COLORS = get_colors(selected_palette)
-
-    draw_sidebar(pdf, foto_path=foto_path, data=data, colors_palette=COLORS)
-    y_content = MARGIN_TOP
-
-    seccoes = [
-        ('Resumo Profissional', 'resumo'),
-        ('Habilidades Técnicas', 'habilidades'),
-        ('Experiência Profissional', 'experiencia'),
-        ('Formação Acadêmica', 'escolaridade'),
-        ('Cursos Complementares', 'cursos'),
-        ('Certificações', 'certificacoes'),
-        ('Projetos Relevantes', 'projetos')
-    ]
-
-    for titulo, campo in seccoes:
-        if data[campo]:
-            print(f"[DEBUG] Processing section {titulo}: '{data[campo][:50]}...'")
-            
-            y_content = draw_section_header(pdf, titulo, y_content, colors_palette=COLORS)
-            
-            if campo == 'habilidades':
-                skills = [skill.strip() for skill in data[campo].split(',') if skill.strip()]
-                for skill in skills:
-                    # Yellow bullet point aligned with text baseline
-                    pdf.setFillColor(COLORS['secondary'])
-                    pdf.circle(SIDEBAR_WIDTH + 1.3*cm, y_content + 0.15*cm, 0.1*cm, fill=1)
-                    
-                    pdf.setFont("Helvetica", 11)
-                    pdf.setFillColor(COLORS['text'])
-                    pdf.drawString(SIDEBAR_WIDTH + 1.8*cm, y_content, skill)
-                    y_content -= 0.6*cm
-            
-            elif campo == 'experiencia':
-                print(f"[DEBUG] Processing structured experiencia content")
-                
-                # Split by double newlines (each experience block)
-                experience_blocks = [exp.strip() for exp in data[campo].split('\n\n') if exp.strip()]
-                print(f"[DEBUG] Found {len(experience_blocks)} experience blocks")
-                
-                for i, exp_block in enumerate(experience_blocks):
-                    if exp_block:
-                        print(f"[DEBUG] Processing experience block {i+1}")
-                        
-                        lines = exp_block.split('\n')
-                        header_line = lines[0] if lines else ""
-                        
-                        if header_line and not header_line.startswith('•'):
-                            pdf.setFont("Helvetica-Bold", 12)
-                            pdf.setFillColor(COLORS['text'])  # Use text color instead of primary
-                            y_content = draw_wrapped_text(pdf, header_line, SIDEBAR_WIDTH + 1*cm, y_content, CONTENT_WIDTH, 
-                                                        font_name="Helvetica-Bold", font_size=12, color=COLORS['text'], colors_palette=COLORS)
-                            y_content -= 0.8*cm
-                        
-                        for line in lines[1:]:
-                            if line.strip() and line.strip().startswith('•'):
-                                bullet_text = line.strip()[1:].strip()  # Remove bullet and trim
-                                
-                                # Calculate text wrapping first to get proper bullet position
-                                pdf.setFont("Helvetica", 11)
-                                words = bullet_text.split()
-                                text_lines = []
-                                current_line = ""
-                                text_width = CONTENT_WIDTH - 0.8*cm
-                                
-                                for word in words:
-                                    test_line = f"{current_line} {word}".strip()
-                                    if stringWidth(test_line, "Helvetica", 11) > text_width:
-                                        if current_line:
-                                            text_lines.append(current_line)
-                                        current_line = word
-                                    else:
-                                        current_line = test_line
-                                
-                                if current_line:
-                                    text_lines.append(current_line)
-                                
-                                # Draw bullet aligned with first line of text
-                                if text_lines:
-                                    pdf.setFillColor(COLORS['secondary'])
-                                    pdf.circle(SIDEBAR_WIDTH + 1.3*cm, y_content + 0.1*cm, 0.08*cm, fill=1)
-                                    
-                                    pdf.setFillColor(COLORS['text'])
-                                    for j, text_line in enumerate(text_lines):
-                                        pdf.drawString(SIDEBAR_WIDTH + 1.8*cm, y_content, text_line)
-                                        y_content -= 16  # Line height
-                                    
-                                    y_content -= 0.2*cm  # Extra space after bullet item
-                        
-                        y_content -= 0.8*cm  # Space between experience blocks
-            
-            else:
-                y_content = draw_wrapped_text(pdf, data[campo], SIDEBAR_WIDTH + 1*cm, y_content, CONTENT_WIDTH, font_size=11, line_height=18, color=COLORS['text'], colors_palette=COLORS)
-
-            y_content -= 1*cm
-        else:
-            print(f"[DEBUG] Section {titulo} is empty or None")
-
-    pdf.showPage()
-    pdf.save()
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name=f"curriculo_profissional_{data['nome'].replace(' ', '_')}.pdf", mimetype='application/pdf')
-
-def get_colors(palette_name='professional'):
-    return COLOR_PALETTES.get(palette_name, COLOR_PALETTES['professional'])
+    with STAGE_SECONDS.time(stage='parse'):
+        resume = parse_form_data(request.form)
+        photo_bytes = read_form_photo()
+    return send_resume(resume, photo_bytes)
+
+@app.route('/api/gerar', methods=['POST'])
+def api_gerar():
+    # The structured resume as JSON (see Resume.from_json), with an optional
+    # `foto_base64`; answers with the PDF just like /gerar
+    request.max_content_length = API_MAX_CONTENT_LENGTH
+    with STAGE_SECONDS.time(stage='parse'):
+        body = request.get_json(silent=True)
+        try:
+            resume = Resume.from_json(body)
+            photo_bytes = load_photo(body)
+        except ResumeError as e:
+            return jsonify(erro=str(e)), 400
+        except PhotoRejected as e:
+            return jsonify(erro=str(e)), e.status
+    return send_resume(resume, photo_bytes)
+
+def palette_entries(resume, photo_bytes):
+    # (index, name, pdf_bytes, error) per palette, as stream_zip takes them.
+    # Palettes already in the PDF cache (from /gerar) are reused; the rest
+    # are rendered in one pass that shares layout and photo work.
+    digest = photo_store.digest(photo_bytes) if photo_bytes else ''
+    keys = {palette: resume_cache_key(replace(resume, paleta=palette), digest) for palette in COLOR_PALETTES}
+    found = {palette: pdf_cache.get(key) for palette, key in keys.items()}
+    missing = [palette for palette, pdf_bytes in found.items() if pdf_bytes is None]
+    if missing:
+        with render_gate.admit(render_cost(resume, photo_bytes, copies=len(missing)), client_connected()):
+            for palette, pdf_bytes in render_palettes(resume, photo_bytes, missing):
+                pdf_cache.put(keys[palette], pdf_bytes)
+                found[palette] = pdf_bytes
+    stem = download_name(resume)[:-len('.pdf')]
+    return [(index, f"{stem}_{palette}.pdf", found[palette], None)
+            for index, palette in enumerate(COLOR_PALETTES, 1)]
+
+@app.route('/gerar/paletas', methods=['POST'])
+def gerar_paletas():
+    # The resume in every palette, to compare them side by side: one PDF with
+    # a bookmark per palette (default), or formato=zip for one PDF each
+    with STAGE_SECONDS.time(stage='parse'):
+        resume = parse_form_data(request.form)
+        photo_bytes = read_form_photo()
+    stem = download_name(resume)[:-len('.pdf')]
+
+    try:
+        if request.values.get('formato') == 'zip':
+            entries = palette_entries(resume, photo_bytes)
+            return set_attachment(Response(counted(stream_zip(entries)), mimetype='application/zip'),
+                                  f"{stem}_paletas.zip")
+
+        etag = resume_cache_key(replace(resume, paleta=''), photo_store.digest(photo_bytes) if photo_bytes else '',
+                                variant='paletas')
+        if etag in request.if_none_match:
+            return precondition_failed(etag)
+        pdf_bytes = pdf_cache.get(etag)
+        if pdf_bytes is None:
+            # Page bodies are drawn once for all palettes, so the sheet costs
+            # about two renders rather than one per palette
+            with render_gate.admit(render_cost(resume, photo_bytes, copies=2), client_connected()):
+                pdf_bytes = render_palette_sheet(resume, photo_bytes)
+            pdf_cache.put(etag, pdf_bytes)
+    except PhotoRejected as e:
+        abort(e.status, description=str(e))
+    BYTES_OUT.inc(len(pdf_bytes))
+    return send_file(io.BytesIO(pdf_bytes), as_attachment=True, download_name=f"{stem}_paletas.pdf",
+                     mimetype='application/pdf', etag=etag)
+
+@app.route('/gerar/lote', methods=['POST'])
+def gerar_lote():
+    # JSONL either as an `arquivo` upload or as the raw request body, under
+    # the batch's own size limit rather than the single-photo one
+    request.max_content_length = MAX_BATCH_BYTES
+    upload = request.files.get('arquivo')
+    raw = upload.read() if upload else request.get_data()
+    try:
+        records = read_records(raw.decode('utf-8').splitlines())
+    except (BatchError, UnicodeDecodeError) as e:
+        abort(400, description=str(e))
+    if not records:
+        abort(400, description="Nenhum currículo no lote")
+    if not batch_slots.acquire(blocking=False):
+        raise Overloaded("Muitos lotes em andamento, tente novamente em instantes", RENDER_RETRY_AFTER)
+
+    # The ZIP is rendered while it streams; closing the response (finished or
+    # client gone) cancels the records not yet started and frees the slot
+    results = render_batch(records, pool=shared_pool())
+    response = set_attachment(Response(counted(stream_zip(results)), mimetype='application/zip'), 'curriculos.zip')
+    response.call_on_close(results.close)
+    response.call_on_close(batch_slots.release)
+    return response
+
+@app.route('/jobs', methods=['POST'])
+def criar_job():
+    resume = parse_form_data(request.form)
+    photo_bytes = read_form_photo()
+    try:
+        job_id = job_queue.submit(resume.to_json(), photo_bytes)
+    except QueueFull as e:
+        return jsonify(erro=str(e)), 503, {'Retry-After': '5'}
+
+    status_url = url_for('status_job', job_id=job_id)
+    return jsonify(id=job_id, status='queued', status_url=status_url,
+                   pdf_url=url_for('pdf_job', job_id=job_id)), 202, {'Location': status_url}
+
+@app.route('/jobs/<job_id>')
+def status_job(job_id):
+    job = job_queue.store.status(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/pdf')
+def pdf_job(job_id):
+    result = job_queue.store.result(job_id)
+    if result is None:
+        job = job_queue.store.status(job_id)
+        if job is None:
+            abort(404)
+        # Not finished (or failed): the status document says which
+        return jsonify(job), 409
+    pdf_bytes, filename = result
+    BYTES_OUT.inc(len(pdf_bytes))
+    return send_file(io.BytesIO(pdf_bytes), as_attachment=True, download_name=filename,
+                     mimetype='application/pdf')
+
+@app.route('/metrics')
+def metrics():
+    # Every worker's series, whichever worker takes the scrape
+    return Response(REGISTRY.expose_all(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
+    clear_process_files()
     app.run(debug=True)
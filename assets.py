@@ -0,0 +1,72 @@
+# Responses that never change while the app runs: the static files, served
+# under content-hashed names (form.3f2a9c1b7d4e.css) so they can be cached
+# for good, and the form page, rendered once. Each body is compressed once,
+# up front, with gzip and, where the brotli module is installed, brotli.
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred order when the client accepts several encodings
+ENCODINGS = ('br', 'gzip')
+
+
+class Precompressed:
+    """One response body with its compressed variants and a strong ETag each.
+
+    Variants that come out no smaller than the body are not kept.
+    """
+
+    def __init__(self, data, mimetype):
+        self.mimetype = mimetype
+        self.digest = hashlib.sha256(data).hexdigest()
+        self.variants = {'identity': data}
+        compressed = {'gzip': gzip.compress(data, 9, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(data, quality=11)
+        for encoding, body in compressed.items():
+            if len(body) < len(data):
+                self.variants[encoding] = body
+
+    def choose(self, accept_encodings):
+        # `accept_encodings` is werkzeug's parsed Accept-Encoding header
+        for encoding in ENCODINGS:
+            if encoding in self.variants and accept_encodings[encoding]:
+                return encoding
+        return 'identity'
+
+    def etag(self, encoding):
+        # Strong ETags name one exact byte sequence, so each variant has its own
+        return self.digest[:32] if encoding == 'identity' else f'{self.digest[:32]}-{encoding}'
+
+
+class StaticAssets:
+    """The files directly under ``folder``, fingerprinted and precompressed.
+
+    Uploads live in subdirectories and are left to Flask's own static route.
+    """
+
+    def __init__(self, folder):
+        self.assets = {}
+        self.names = {}
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if not os.path.isfile(path):
+                continue
+            with open(path, 'rb') as f:
+                asset = Precompressed(f.read(), mimetypes.guess_type(name)[0] or 'application/octet-stream')
+            stem, ext = os.path.splitext(name)
+            hashed = f'{stem}.{asset.digest[:12]}{ext}'
+            self.assets[hashed] = asset
+            self.names[name] = hashed
+
+    def hashed_name(self, name):
+        return self.names[name]
+
+    def get(self, hashed):
+        return self.assets.get(hashed)
@@ -0,0 +1,238 @@
+# Bulk resume generation: one JSONL record per resume, using the same field
+# names as the /gerar form or the structured /api/gerar JSON, rendered across
+# a process pool (the server's shared one for /gerar/lote).
+#
+#   python batch.py candidatos.jsonl -o saida/
+#   python batch.py candidatos.jsonl --zip curriculos.zip
+#   python batch.py - --zip - < candidatos.jsonl > curriculos.zip
+import argparse
+import base64
+import binascii
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+from werkzeug.utils import secure_filename
+
+from model import Resume, ResumeError
+from render import MAX_PHOTO_BYTES, PhotoRejected, parse_form_data, render_pdf, download_name
+
+MAX_BATCH_RECORDS = 1000
+# Request body limit for /gerar/lote: a full batch with a photo of up to
+# about 128 KB of base64 per record
+BATCH_RECORD_BYTES = 128 * 1024
+MAX_BATCH_BYTES = MAX_BATCH_RECORDS * BATCH_RECORD_BYTES
+
+
+class BatchError(ValueError):
+    pass
+
+
+def read_records(lines):
+    records = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise BatchError(f"linha {number}: JSON inválido ({e.msg})")
+        if not isinstance(record, dict):
+            raise BatchError(f"linha {number}: esperado um objeto JSON")
+        # Form fields are always strings; JSON may carry numbers or nulls.
+        # Lists and objects belong to the structured format and are kept.
+        records.append({key: '' if value is None else value if isinstance(value, (list, dict)) else str(value)
+                        for key, value in record.items()})
+        if len(records) > MAX_BATCH_RECORDS:
+            raise BatchError(f"lote maior que {MAX_BATCH_RECORDS} currículos")
+    return records
+
+
+def load_photo(record, allow_paths=False):
+    # `foto_base64` works everywhere; a `foto` file path only from the CLI
+    if record.get('foto_base64'):
+        if not isinstance(record['foto_base64'], str):
+            raise PhotoRejected("foto_base64 deve ser texto", status=400)
+        try:
+            data = base64.b64decode(record['foto_base64'], validate=True)
+        except binascii.Error:
+            raise PhotoRejected("foto_base64 inválido", status=400)
+    elif allow_paths and record.get('foto'):
+        with open(record['foto'], 'rb') as f:
+            data = f.read(MAX_PHOTO_BYTES + 1)
+    else:
+        return None
+    if len(data) > MAX_PHOTO_BYTES:
+        raise PhotoRejected(f"Foto maior que {MAX_PHOTO_BYTES // (1024 * 1024)} MB")
+    return data
+
+
+def parse_record(record):
+    # Records are either flat form fields or the structured /api/gerar JSON
+    if 'experiencias' in record:
+        return Resume.from_json(record)
+    return parse_form_data(record)
+
+
+def render_record(job):
+    # Runs in a pool worker; failures are returned so one bad record does not sink the batch
+    index, record, allow_paths = job
+    name = f"{index:04d}_curriculo.pdf"
+    try:
+        resume = parse_record(record)
+        name = f"{index:04d}_{secure_filename(download_name(resume))}"
+        return index, name, render_pdf(resume, load_photo(record, allow_paths)), None
+    except (ResumeError, PhotoRejected, OSError) as e:
+        return index, name, None, str(e)
+
+
+# Batches posted over HTTP share one pool per server process, so concurrent
+# batches never add processes. Its processes come from a forkserver: forking
+# the threaded gunicorn worker itself could hand a child a lock (metrics,
+# caches, logging) that another thread held at that moment.
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 2))
+_shared_pool = None
+_shared_pool_pid = None
+_shared_pool_lock = threading.Lock()
+
+
+def shared_pool():
+    global _shared_pool, _shared_pool_pid
+    with _shared_pool_lock:
+        # Created on first use in each worker, never in the preloading master
+        if _shared_pool is None or _shared_pool_pid != os.getpid():
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            context = multiprocessing.get_context(method)
+            if method == 'forkserver':
+                context.set_forkserver_preload(['batch'])
+            _shared_pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=context)
+            _shared_pool_pid = os.getpid()
+        return _shared_pool
+
+
+def discard_shared_pool(pool):
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is pool:
+            _shared_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_batch(records, allow_paths=False, workers=None, pool=None):
+    # Results in record order. Only a couple of records per process are in
+    # flight at a time; when the consumer stops early (the generator is
+    # closed, e.g. the client hung up), the ones not yet started are
+    # cancelled instead of rendered for nobody.
+    jobs = [(index, record, allow_paths) for index, record in enumerate(records, 1)]
+    if pool is not None:
+        try:
+            yield from _render_jobs(pool, jobs, BATCH_WORKERS * 2)
+        except BrokenProcessPool:
+            # A pool process died; the next batch gets a fresh pool
+            discard_shared_pool(pool)
+            raise
+        return
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as own_pool:
+        yield from _render_jobs(own_pool, jobs, workers * 2)
+
+
+def _render_jobs(pool, jobs, window):
+    jobs = iter(jobs)
+    pending = deque(pool.submit(render_record, job) for job in islice(jobs, window))
+    try:
+        while pending:
+            result = pending.popleft().result()
+            pending.extend(pool.submit(render_record, job) for job in islice(jobs, 1))
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class _ChunkSink:
+    # Write-only, unseekable target: zipfile falls back to data descriptors,
+    # so each entry can be sent as soon as it is written
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+
+def stream_zip(results):
+    sink = _ChunkSink()
+    errors = []
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        for index, name, pdf_bytes, error in results:
+            if error:
+                errors.append(f"{index}: {error}")
+            else:
+                archive.writestr(name, pdf_bytes)
+            yield from sink.drain()
+        if errors:
+            archive.writestr('erros.txt', '\n'.join(errors) + '\n')
+    yield from sink.drain()
+
+
+def write_directory(results, directory):
+    os.makedirs(directory, exist_ok=True)
+    errors = []
+    for index, name, pdf_bytes, error in results:
+        if error:
+            errors.append(f"{index}: {error}")
+            continue
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(pdf_bytes)
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera currículos em lote a partir de um arquivo JSONL.")
+    parser.add_argument('entrada', help="arquivo JSONL, um currículo por linha ('-' para stdin)")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('-o', '--saida', help="diretório para os PDFs")
+    output.add_argument('--zip', help="arquivo ZIP de saída ('-' para stdout)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="processos (padrão: todos os núcleos)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.entrada == '-':
+            records = read_records(sys.stdin)
+        else:
+            with open(args.entrada, encoding='utf-8') as f:
+                records = read_records(f)
+    except BatchError as e:
+        parser.error(str(e))
+
+    results = render_batch(records, allow_paths=True, workers=args.workers)
+    if args.saida:
+        errors = write_directory(results, args.saida)
+        for error in errors:
+            print(f"erro: {error}", file=sys.stderr)
+        return 1 if errors else 0
+
+    out = sys.stdout.buffer if args.zip == '-' else open(args.zip, 'wb')
+    with out:
+        for chunk in stream_zip(results):
+            out.write(chunk)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Output size versus render time of the default and compact output modes,
+for every palette, with and without a photo.
+
+Each photo is a distinct 1600x1200 JPEG, so the photo store never hands back
+a processed photo and the time includes the photo work.
+
+Usage: python benchmarks/bench_compact.py [--repeat N] [--experiences N]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageFilter
+
+import render
+from photo_store import PhotoStore
+
+
+def photo(seed, size=(1600, 1200)):
+    # Smooth shapes with a little grain, closer to a real portrait than pure noise
+    base = Image.radial_gradient('L').resize(size).convert('RGB')
+    grain = Image.effect_noise(size, 12).convert('RGB')
+    image = Image.blend(base, grain, 0.25).filter(ImageFilter.GaussianBlur(2))
+    image.putpixel((0, 0), (seed % 256, seed // 256 % 256, 0))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def resume(palette, experiences, compact):
+    form = {
+        'nome': 'Maria Aparecida dos Santos',
+        'email': 'maria@example.com',
+        'telefone': '(11) 99999-9999',
+        'resumo': 'Profissional com ampla experiência em desenvolvimento de software. ' * 6,
+        'habilidades': ', '.join(f'Habilidade {i}' for i in range(20)),
+        'escolaridade': 'Bacharelado em Ciência da Computação - USP (2015)',
+        'paleta': palette,
+        'compacto': '1' if compact else '',
+    }
+    for i in range(1, experiences + 1):
+        form[f'empresa{i}'] = f'Empresa {i} Tecnologia S.A.'
+        form[f'cargo{i}'] = 'Engenheira de Software'
+        form[f'responsabilidades{i}'] = '\n'.join(f'Conduziu a iniciativa {j} com equipes multidisciplinares'
+                                                 for j in range(4))
+    return render.parse_form_data(form)
+
+
+def measure(data, photos, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        pdf_bytes = render.render_pdf(data, photos[i] if photos else None)
+        times.append(time.perf_counter() - start)
+    return len(pdf_bytes), sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--experiences', type=int, default=3)
+    args = parser.parse_args()
+
+    # Keep benchmark photos out of the real photo store
+    scratch = tempfile.mkdtemp(prefix='bench-compact-')
+    render.photo_store = PhotoStore(scratch, render.create_circle_image, render.create_compact_photo,
+                                    memory_items=0)
+    seed = iter(range(10 ** 6))
+
+    print(f"{'palette':<14} {'photo':<6} {'default B':>10} {'compact B':>10} {'saved':>7} "
+          f"{'default ms':>11} {'compact ms':>11}")
+    for palette in render.COLOR_PALETTES:
+        for with_photo in (False, True):
+            row = []
+            for compact in (False, True):
+                photos = [photo(next(seed)) for _ in range(args.repeat)] if with_photo else None
+                row.append(measure(resume(palette, args.experiences, compact), photos, args.repeat))
+            (default_size, default_time), (compact_size, compact_time) = row
+            print(f"{palette:<14} {'sim' if with_photo else 'não':<6} {default_size:>10} {compact_size:>10} "
+                  f"{1 - compact_size / default_size:>7.1%} {default_time * 1000:>11.2f} {compact_time * 1000:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
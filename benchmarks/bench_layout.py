@@ -0,0 +1,65 @@
+"""Throughput of the shared line breaker against the old per-call-site loop.
+
+Usage: python benchmarks/bench_layout.py [--words N] [--repeat N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from layout import break_lines
+
+WIDTH = 368.0  # CONTENT_WIDTH in points
+WORDS = ("desenvolvimento", "de", "sistemas", "distribuídos", "com", "Python", "e", "equipe",
+         "performance", "otimização", "liderança", "implementação", "arquitetura", "cliente")
+
+
+def legacy_break_lines(text, max_width, font_name, font_size):
+    # The loop app.py used before the layout engine: re-measures the whole line per word
+    lines = []
+    line = ""
+    for word in text.split():
+        test_line = f"{line} {word}".strip()
+        if stringWidth(test_line, font_name, font_size) > max_width:
+            if line:
+                lines.append(line)
+            line = word
+        else:
+            line = test_line
+    if line:
+        lines.append(line)
+    return lines
+
+
+def measure(fn, text, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text, WIDTH, "Helvetica", 11)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--words', type=int, nargs='+', default=[100, 1000, 5000, 20000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'words':>8} {'legacy ms':>10} {'engine ms':>10} {'speedup':>8}")
+    for count in args.words:
+        text = ' '.join(rng.choice(WORDS) for _ in range(count))
+        assert legacy_break_lines(text, WIDTH, "Helvetica", 11) == break_lines(text, WIDTH, "Helvetica", 11)
+        legacy = measure(legacy_break_lines, text, args.repeat)
+        engine = measure(break_lines, text, args.repeat)
+        print(f"{count:>8} {legacy * 1000:>10.2f} {engine * 1000:>10.2f} {legacy / engine:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
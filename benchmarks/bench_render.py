@@ -0,0 +1,256 @@
+"""Benchmark suite for the resume render path.
+
+Renders synthetic resumes of increasing size (0-30 experiences, long resumo,
+200 skills, with and without photo, every palette) through Flask's test
+client and through render_pdf directly, plus the individual drawing
+helpers and the all-palettes renders. Reports latency percentiles,
+PDFs/second, peak traced memory and the process's peak RSS per case (PIL's
+pixel buffers are not seen by tracemalloc), and writes them as JSON so runs
+can be compared:
+
+    python benchmarks/bench_render.py -o base.json
+    python benchmarks/bench_render.py -o new.json --baseline base.json --threshold 0.15
+
+With --baseline the run exits with status 1 when any case's p50 is more than
+--threshold slower than in the baseline.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import replace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+import app as curriculo_app
+import render
+from cache_store import TieredCache
+from photo_store import PhotoStore
+
+EXPERIENCE_COUNTS = (0, 5, 10, 30)
+QUICK_EXPERIENCE_COUNTS = (0, 10)
+
+
+def synthetic_resume(experiences, palette='professional', long_text=True, skills=200):
+    form = {
+        'nome': 'Maria Aparecida dos Santos Benchmark',
+        'email': 'maria@example.com',
+        'telefone': '(11) 99999-9999',
+        'endereco': 'São Paulo, SP',
+        'linkedin': 'linkedin.com/in/maria',
+        'github': 'github.com/maria',
+        'resumo': ('Profissional com ampla experiência em desenvolvimento de software, '
+                   'liderança técnica e entrega de produtos digitais. ') * (40 if long_text else 2),
+        'habilidades': ', '.join(f'Habilidade {i}' for i in range(skills)),
+        'escolaridade': 'Bacharelado em Ciência da Computação - USP (2015)',
+        'cursos': 'Arquitetura de Software - Alura (2020)\nKubernetes - Linux Foundation (2021)',
+        'certificacoes': 'AWS Solutions Architect - Amazon (2022)',
+        'projetos': 'Gerador de currículos - Flask e ReportLab',
+        'paleta': palette,
+    }
+    for i in range(1, experiences + 1):
+        form[f'empresa{i}'] = f'Empresa {i} Tecnologia S.A.'
+        form[f'cargo{i}'] = 'Engenheira de Software Sênior'
+        form[f'periodo{i}'] = f'Jan {2000 + i} - Dez {2001 + i}'
+        form[f'responsabilidades{i}'] = '\n'.join(
+            f'Responsável por conduzir a iniciativa {j} com equipes multidisciplinares' for j in range(4))
+        form[f'conquistas{i}'] = '\n'.join(f'Reduziu custos da área {j} em {10 * j}%' for j in range(1, 3))
+    return form
+
+
+def photo_variants(count, size=(1600, 1200)):
+    # Distinct bytes per iteration so the photo store never short-circuits
+    # PIL. A changed pixel often encodes to the same JPEG; the comment
+    # segment always differs.
+    base = Image.effect_noise(size, 40).convert('RGB')
+    photos = []
+    for i in range(count):
+        buffer = io.BytesIO()
+        base.save(buffer, 'JPEG', quality=85, comment=f'bench {i}'.encode())
+        photos.append(buffer.getvalue())
+    return photos
+
+
+def scratch_photo_store(scratch):
+    # An empty store with no memory tier, so each case processes every photo
+    # it is given instead of finding it from an earlier case
+    render.photo_store = PhotoStore(tempfile.mkdtemp(dir=scratch), render.create_circle_image,
+                                    render.create_compact_photo, memory_items=0)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_case(fn, iterations, warmup):
+    for i in range(warmup):
+        fn(-1 - i)
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+
+    # Memory is traced on a separate call, since tracemalloc itself slows rendering down
+    tracemalloc.start()
+    fn(iterations)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # High-water mark of the whole process so far (KiB on Linux): it only
+    # moves when a case needs more than every case before it
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    total = sum(samples)
+    return {
+        'iterations': iterations,
+        'p50_ms': percentile(samples, 0.50) * 1000,
+        'p90_ms': percentile(samples, 0.90) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'mean_ms': total / iterations * 1000,
+        'per_second': iterations / total if total else 0.0,
+        'peak_kib': peak / 1024,
+        'max_rss_kib': rss,
+    }
+
+
+def render_cases(experience_counts, palettes, photos):
+    client = curriculo_app.app.test_client()
+    cases = {}
+    for experiences in experience_counts:
+        for palette in palettes:
+            for with_photo in (False, True):
+                form = synthetic_resume(experiences, palette)
+                label = f"exp{experiences}-{palette}-{'foto' if with_photo else 'sem_foto'}"
+
+                def direct(i, form=form, with_photo=with_photo):
+                    # A changing e-mail keeps every iteration out of the result cache
+                    data = render.parse_form_data(dict(form, email=f'{i}@example.com'))
+                    render.render_pdf(data, photos[i % len(photos)] if with_photo else None)
+
+                def http(i, form=form, with_photo=with_photo):
+                    fields = dict(form, email=f'http{i}@example.com')
+                    if with_photo:
+                        fields['foto'] = (io.BytesIO(photos[i % len(photos)]), 'foto.jpg')
+                    response = client.post('/gerar', data=fields, content_type='multipart/form-data')
+                    assert response.status_code == 200, response.status_code
+                    response.get_data()
+
+                cases[f'direct/{label}'] = direct
+                cases[f'http/{label}'] = http
+    return cases
+
+
+def helper_cases(photos):
+    colors = render.document_palette('professional')
+    resume = render.parse_form_data(synthetic_resume(0))
+
+    def new_canvas():
+        return canvas.Canvas(io.BytesIO(), pagesize=A4)
+
+    return {
+        'helper/create_circle_image': lambda i: render.create_circle_image(photos[i % len(photos)]),
+        'helper/draw_sidebar': lambda i: render.draw_sidebar(new_canvas(), contact=resume.contact, colors_palette=colors),
+        'helper/draw_wrapped_text': lambda i: render.draw_wrapped_text(
+            new_canvas(), resume.resumo * 5, render.SIDEBAR_WIDTH, render.MARGIN_TOP,
+            render.CONTENT_WIDTH, colors_palette=colors),
+    }
+
+
+def palette_cases(photos):
+    # Every palette of one resume: one render_pdf per palette, the one-pass
+    # render_palettes behind the ZIP, and the single palette sheet
+    form = synthetic_resume(10)
+
+    def resume(i):
+        return render.parse_form_data(dict(form, email=f'palettes{i}@example.com'))
+
+    return {
+        'palettes/separate': lambda i: [render.render_pdf(replace(resume(i), paleta=p), photos[i % len(photos)])
+                                        for p in render.COLOR_PALETTES],
+        'palettes/one_pass': lambda i: list(render.render_palettes(resume(i), photos[i % len(photos)])),
+        'palettes/sheet': lambda i: render.render_palette_sheet(resume(i), photos[i % len(photos)]),
+    }
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, case in results['cases'].items():
+        before = baseline.get('cases', {}).get(name)
+        if not before:
+            continue
+        change = case['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0.0
+        marker = ' REGRESSION' if change > threshold else ''
+        print(f"{name:<50} {before['p50_ms']:>9.2f} -> {case['p50_ms']:>9.2f} ms {change:>+7.1%}{marker}")
+        if marker:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--quick', action='store_true', help="fewer sizes and a single palette")
+    parser.add_argument('-k', '--filter', default='', help="only run cases whose name contains this")
+    parser.add_argument('-o', '--output', help="write results as JSON")
+    parser.add_argument('--baseline', help="JSON from a previous run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed p50 slowdown (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    # Keep benchmark renders out of the real caches
+    scratch = tempfile.mkdtemp(prefix='bench-render-')
+    curriculo_app.pdf_cache = TieredCache(os.path.join(scratch, 'pdf'), suffix='.pdf', memory_items=0)
+
+    experience_counts = QUICK_EXPERIENCE_COUNTS if args.quick else EXPERIENCE_COUNTS
+    palettes = ['professional'] if args.quick else list(render.COLOR_PALETTES)
+    photos = photo_variants(args.iterations + args.warmup + 1)
+    cases = {**helper_cases(photos), **palette_cases(photos), **render_cases(experience_counts, palettes, photos)}
+
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'iterations': args.iterations,
+        },
+        'cases': {},
+    }
+    print(f"{'case':<50} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'/s':>8} {'peak KiB':>9} {'RSS KiB':>9}")
+    for name, fn in cases.items():
+        if args.filter not in name:
+            continue
+        scratch_photo_store(scratch)
+        case = run_case(fn, args.iterations, args.warmup)
+        results['cases'][name] = case
+        print(f"{name:<50} {case['p50_ms']:>9.2f} {case['p90_ms']:>9.2f} {case['p99_ms']:>9.2f} "
+              f"{case['per_second']:>8.1f} {case['peak_kib']:>9.0f} {case['max_rss_kib']:>9}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than the {args.threshold:.0%} threshold")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Output size and render time of 1-, 3- and 10-page resumes, with the
+sidebar chrome drawn inline on every page versus as a shared form XObject.
+
+Usage: python benchmarks/bench_sidebar.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import render as curriculo
+from model import Contact, Resume
+
+
+def resume_with_pages(pages):
+    # About 40 lines of 18pt fit on a content page
+    resumo = '\n'.join(['Profissional com experiência em desenvolvimento de software. ' * 5] * (8 * pages - 2))
+    return Resume(contact=Contact(nome='Maria Benchmark'), resumo=resumo, paleta='corporate')
+
+
+def count_pages(pdf_bytes):
+    return pdf_bytes.count(b'/Type /Page\n') or pdf_bytes.count(b'/Type /Page ')
+
+
+def measure(data, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pdf_bytes = curriculo.render_pdf(data)
+        best = min(best, time.perf_counter() - start)
+    return pdf_bytes, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'pages':>5} {'inline B':>9} {'form B':>9} {'inline ms':>10} {'form ms':>8}")
+    for target in (1, 3, 10):
+        data = resume_with_pages(target)
+        curriculo.SIDEBAR_AS_FORM = False
+        inline_pdf, inline_time = measure(data, args.repeat)
+        curriculo.SIDEBAR_AS_FORM = True
+        form_pdf, form_time = measure(data, args.repeat)
+        print(f"{count_pages(form_pdf):>5} {len(inline_pdf):>9} {len(form_pdf):>9} "
+              f"{inline_time * 1000:>10.2f} {form_time * 1000:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
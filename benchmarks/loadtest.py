@@ -0,0 +1,402 @@
+"""Concurrent load test against the app running under gunicorn.
+
+Starts `gunicorn -c gunicorn.conf.py app:app` on a free local port with the
+requested worker count and class, then fires a mix of GET / and POST /gerar
+(with and without a photo, 0-10 experiences, some in compact mode) from a
+pool of client threads. Reports throughput, latency percentiles per kind of
+request, error rates and the RSS of every worker:
+
+    python benchmarks/loadtest.py -w 4 -c 16 -n 500
+    python benchmarks/loadtest.py -k gthread -c 32 --duration 60 -o load.json
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 -c 8
+
+Every PDF is checked against its own request: the name in the document
+info must be the one that was posted, and with a photo the centre pixel of
+the embedded image must have the colour that request uploaded (each request
+sends a solid image of its own colour). A response carrying another
+request's data counts as a mismatch, and any mismatch or error makes the run
+exit with status 1. A 503 with Retry-After is the server shedding load (see
+admission.py) and is counted as rejected rather than as an error; run
+against threaded workers with a small RENDER_CAPACITY to exercise it:
+
+    RENDER_CAPACITY=2 python benchmarks/loadtest.py -c 32
+"""
+import argparse
+import base64
+import http.client
+import io
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXPERIENCE_COUNTS = (0, 1, 3, 10)
+PALETTES = ('professional', 'corporate', 'modern', 'elegant')
+COLOUR_TOLERANCE = 8
+
+OBJECT_RE = re.compile(rb'<<(.*?)>>\s*stream\r?\n', re.S)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(port, workers, worker_class, threads):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_WORKER_CLASS=worker_class,
+               LOG_LEVEL=os.environ.get('LOG_LEVEL', 'WARNING'))
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}']
+    if threads:
+        command += ['--threads', str(threads)]
+    command.append('app:app')
+    return subprocess.Popen(command, cwd=ROOT, env=env)
+
+
+def wait_ready(host, port, server, workers, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server and server.poll() is not None:
+            raise RuntimeError(f"gunicorn saiu com status {server.returncode}")
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=5)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            connection.close()
+            if not server or len(worker_pids(server.pid)) >= workers:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("gunicorn não ficou pronto a tempo")
+
+
+def worker_pids(master_pid):
+    # Children of the gunicorn master, from /proc; empty where there is no /proc
+    pids = []
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return pids
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may hold spaces; the fields after it are fixed
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == master_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def rss_kib(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler(threading.Thread):
+    # Samples worker RSS in the background, keeping the first, peak and last value
+    def __init__(self, master_pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.samples = {}
+        self._done = threading.Event()
+
+    def sample(self):
+        for pid in worker_pids(self.master_pid):
+            rss = rss_kib(pid)
+            if rss is None:
+                continue
+            first, peak, _ = self.samples.get(pid, (rss, 0, rss))
+            self.samples[pid] = (first, max(peak, rss), rss)
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.sample()
+
+
+def request_colour(index):
+    # A distinct, well spread colour per request
+    value = (index * 2654435761) & 0xFFFFFF
+    return (value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF
+
+
+def photo_for(index, size=(320, 320)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, request_colour(index)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def resume_fields(index, experiences, palette, compact=False):
+    fields = {
+        'nome': f'Carga {index:06d}',
+        'email': f'carga{index}@example.com',
+        'telefone': '(11) 99999-9999',
+        'resumo': 'Profissional de testes de carga. ' * 10,
+        'habilidades': ', '.join(f'Habilidade {i}' for i in range(12)),
+        'escolaridade': 'Bacharelado em Sistemas de Informação',
+        'paleta': palette,
+        'compacto': '1' if compact else '',
+    }
+    for i in range(1, experiences + 1):
+        fields[f'empresa{i}'] = f'Empresa {i}'
+        fields[f'cargo{i}'] = 'Analista'
+        fields[f'periodo{i}'] = f'{2000 + i} - {2001 + i}'
+        fields[f'responsabilidades{i}'] = '\n'.join(f'Responsabilidade {j} da experiência {i}' for j in range(3))
+    return fields
+
+
+def multipart(fields, photo=None):
+    boundary = f'----carga{random.getrandbits(64):016x}'
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode())
+        body.write(value.encode('utf-8') + b'\r\n')
+    if photo is not None:
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="foto"; filename="foto.png"\r\n'
+                   'Content-Type: image/png\r\n\r\n'.encode())
+        body.write(photo + b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+def pdf_photo_centre(pdf_bytes):
+    # Centre pixel of the photo. ReportLab writes it as uncompressed RGB
+    # behind Flate (and ASCII85, if enabled), or as a JPEG in compact mode.
+    for match in OBJECT_RE.finditer(pdf_bytes):
+        header = match.group(1)
+        if b'/Subtype /Image' not in header or b'/DeviceRGB' not in header:
+            continue
+        width = int(re.search(rb'/Width (\d+)', header).group(1))
+        height = int(re.search(rb'/Height (\d+)', header).group(1))
+        length = int(re.search(rb'/Length (\d+)', header).group(1))
+        data = pdf_bytes[match.end():match.end() + length]
+        if b'/ASCII85Decode' in header:
+            data = base64.a85decode(data, adobe=True)
+        if b'/DCTDecode' in header:
+            return Image.open(io.BytesIO(data)).convert('RGB').getpixel((width // 2, height // 2))
+        if b'/FlateDecode' in header:
+            data = zlib.decompress(data)
+        offset = ((height // 2) * width + width // 2) * 3
+        return tuple(data[offset:offset + 3])
+    return None
+
+
+def check_pdf(pdf_bytes, index, with_photo):
+    # None when the PDF belongs to request `index`, otherwise what is wrong
+    if not pdf_bytes.startswith(b'%PDF'):
+        return 'not_pdf'
+    if f'/Author (Carga {index:06d})'.encode() not in pdf_bytes:
+        return 'name_mismatch'
+    centre = pdf_photo_centre(pdf_bytes)
+    if not with_photo:
+        return None if centre is None else 'unexpected_photo'
+    if centre is None:
+        return 'missing_photo'
+    if any(abs(a - b) > COLOUR_TOLERANCE for a, b in zip(centre, request_colour(index))):
+        return 'photo_mismatch'
+    return None
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LoadTest:
+    def __init__(self, host, port, form_share, photo_share):
+        self.host = host
+        self.port = port
+        self.form_share = form_share
+        self.photo_share = photo_share
+        self.latencies = {}
+        self.errors = {}
+        self.rejected = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind, seconds, error=None):
+        if error == 'rejected':
+            with self._lock:
+                self.rejected[kind] = self.rejected.get(kind, 0) + 1
+            return
+        with self._lock:
+            self.latencies.setdefault(kind, []).append(seconds)
+            if error:
+                self.errors.setdefault(kind, {}).setdefault(error, 0)
+                self.errors[kind][error] += 1
+
+    def one(self, index):
+        rng = random.Random(index)
+        if rng.random() < self.form_share:
+            kind, method, path, body, headers = 'form', 'GET', '/', None, {}
+            with_photo = False
+        else:
+            with_photo = rng.random() < self.photo_share
+            experiences = rng.choice(EXPERIENCE_COUNTS)
+            body, content_type = multipart(resume_fields(index, experiences, rng.choice(PALETTES), rng.random() < 0.25),
+                                           photo_for(index) if with_photo else None)
+            kind = f"gerar-{'foto' if with_photo else 'sem_foto'}"
+            method, path, headers = 'POST', '/gerar', {'Content-Type': content_type}
+
+        start = time.perf_counter()
+        try:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            payload = response.read()
+            connection.close()
+        except (OSError, http.client.HTTPException) as e:
+            self.record(kind, time.perf_counter() - start, type(e).__name__)
+            return
+        elapsed = time.perf_counter() - start
+
+        if response.status == 503 and response.getheader('Retry-After'):
+            error = 'rejected'
+        elif response.status != 200:
+            error = f'http_{response.status}'
+        elif kind == 'form':
+            error = None if b'<form' in payload else 'bad_form'
+        else:
+            error = check_pdf(payload, index, with_photo)
+        self.record(kind, elapsed, error)
+
+
+def run(test, concurrency, total, duration):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if duration:
+            deadline = time.monotonic() + duration
+            counter = iter(range(10 ** 9))
+            lock = threading.Lock()
+
+            def loop():
+                while time.monotonic() < deadline:
+                    with lock:
+                        index = next(counter)
+                    test.one(index)
+            for _ in range(concurrency):
+                pool.submit(loop)
+        else:
+            list(pool.map(test.one, range(total)))
+    return time.perf_counter() - started
+
+
+def summary(test, elapsed):
+    cases = {}
+    for kind in sorted(set(test.latencies) | set(test.rejected)):
+        samples = test.latencies.get(kind) or [0.0]
+        errors = test.errors.get(kind, {})
+        cases[kind] = {
+            'requests': len(test.latencies.get(kind, ())) + test.rejected.get(kind, 0),
+            'rejected': test.rejected.get(kind, 0),
+            'errors': sum(errors.values()),
+            'error_kinds': errors,
+            'p50_ms': percentile(samples, 0.50) * 1000,
+            'p90_ms': percentile(samples, 0.90) * 1000,
+            'p99_ms': percentile(samples, 0.99) * 1000,
+            'max_ms': max(samples) * 1000,
+        }
+    total = sum(case['requests'] for case in cases.values())
+    errors = sum(case['errors'] for case in cases.values())
+    rejected = sum(case['rejected'] for case in cases.values())
+    return {
+        'elapsed_s': elapsed,
+        'requests': total,
+        'errors': errors,
+        'error_rate': errors / total if total else 0.0,
+        'rejected': rejected,
+        'throughput_rps': total / elapsed if elapsed else 0.0,
+        'cases': cases,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-w', '--workers', type=int, default=2, help="gunicorn workers")
+    parser.add_argument('-k', '--worker-class', default='gthread', help="gunicorn worker class")
+    parser.add_argument('--threads', type=int, help="threads per worker (default: gunicorn.conf.py)")
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help="client threads")
+    parser.add_argument('-n', '--requests', type=int, default=200)
+    parser.add_argument('-d', '--duration', type=float, default=0, help="run for this many seconds instead of -n")
+    parser.add_argument('--form-share', type=float, default=0.2, help="fraction of GET / requests")
+    parser.add_argument('--photo-share', type=float, default=0.5, help="fraction of /gerar requests with a photo")
+    parser.add_argument('--url', help="test an already running server instead of starting gunicorn")
+    parser.add_argument('-o', '--output', help="write results as JSON")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        target = urllib.parse.urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        host, port = '127.0.0.1', free_port()
+        server = start_gunicorn(port, args.workers, args.worker_class, args.threads)
+
+    try:
+        wait_ready(host, port, server, args.workers)
+        sampler = RssSampler(server.pid) if server else None
+        if sampler:
+            sampler.start()
+        test = LoadTest(host, port, args.form_share, args.photo_share)
+        elapsed = run(test, args.concurrency, args.requests, args.duration)
+        if sampler:
+            sampler.stop()
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+
+    results = summary(test, elapsed)
+    results['config'] = {key: value for key, value in vars(args).items() if key != 'output'}
+    results['workers_rss_kib'] = {str(pid): {'start': first, 'peak': peak, 'end': last}
+                                  for pid, (first, peak, last) in sorted(sampler.samples.items())} if sampler else {}
+
+    print(f"{results['requests']} requests in {elapsed:.1f}s: {results['throughput_rps']:.1f} req/s, "
+          f"{results['errors']} errors ({results['error_rate']:.2%}), {results['rejected']} rejected with 503")
+    print(f"{'kind':<18} {'n':>6} {'errors':>7} {'503':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for kind, case in results['cases'].items():
+        print(f"{kind:<18} {case['requests']:>6} {case['errors']:>7} {case['rejected']:>6} {case['p50_ms']:>9.1f} "
+              f"{case['p90_ms']:>9.1f} {case['p99_ms']:>9.1f} {case['max_ms']:>9.1f}")
+        for error, count in sorted(case['error_kinds'].items()):
+            print(f"    {error}: {count}")
+    if results['workers_rss_kib']:
+        print(f"\n{'worker pid':<12} {'start MiB':>10} {'peak MiB':>10} {'end MiB':>10}")
+        for pid, rss in results['workers_rss_kib'].items():
+            print(f"{pid:<12} {rss['start'] / 1024:>10.1f} {rss['peak'] / 1024:>10.1f} {rss['end'] / 1024:>10.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 1 if results['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+import functools
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
+class TieredCache:
+    """Byte cache with an in-process LRU tier in front of a bounded directory.
+
+    Disk entries are written to a temp file and renamed into place, so
+    concurrent writers (threads or gunicorn workers) never see a partial file.
+    The directory is trimmed by TTL first and then by least-recent use until
+    it fits in ``disk_bytes``.
+    """
+
+    def __init__(self, directory, suffix='', memory_items=64, memory_bytes=16 * 1024 * 1024,
+                 disk_bytes=256 * 1024 * 1024, ttl=7 * 24 * 3600, gc_every=32, memory_entry_bytes=None):
+        self.directory = directory
+        self.suffix = suffix
+        self.memory_items = memory_items
+        self.memory_bytes = memory_bytes
+        # Larger entries stay on disk only and are streamed from there
+        self.memory_entry_bytes = memory_entry_bytes or memory_bytes
+        self.disk_bytes = disk_bytes
+        self.ttl = ttl
+        self.gc_every = gc_every
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+                # From the open file: another worker's gc may unlink the path
+                mtime = os.fstat(f.fileno()).st_mtime
+        except FileNotFoundError:
+            self._miss()
+            return None
+        if self.ttl and time.time() - mtime > self.ttl:
+            self._unlink(path)
+            self._miss()
+            return None
+        self._hit()
+        # Touch the entry so disk eviction sees it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._remember(key, data)
+        return data
+
+    def open(self, key):
+        # Like get, but returns a binary file object; entries too big for the
+        # memory tier come back as the open disk file so they can be streamed
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return io.BytesIO(data)
+
+        path = self.path(key)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            self._miss()
+            return None
+        stat = os.fstat(f.fileno())
+        if self.ttl and time.time() - stat.st_mtime > self.ttl:
+            f.close()
+            self._unlink(path)
+            self._miss()
+            return None
+        self._hit()
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        if stat.st_size <= self.memory_entry_bytes:
+            with f:
+                data = f.read()
+            self._remember(key, data)
+            return io.BytesIO(data)
+        return f
+
+    def put(self, key, data):
+        self._remember(key, data)
+        self._write(key, lambda f: f.write(data))
+        return self.path(key)
+
+    def _write(self, key, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            self._unlink(tmp_path)
+            raise
+
+        with self._lock:
+            self._puts += 1
+            run_gc = self._puts % self.gc_every == 0
+        if run_gc:
+            self.gc()
+
+    def gc(self):
+        now = time.time()
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            # Stale temp files are leftovers from writers that died mid-write
+            expired = self.ttl and now - stat.st_mtime > self.ttl
+            if expired or (entry.name.startswith('.tmp-') and now - stat.st_mtime > 3600):
+                self._unlink(entry.path)
+                continue
+            if entry.name.startswith('.tmp-'):
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.disk_bytes:
+                break
+            self._unlink(path)
+            total -= size
+        return total
+
+    def _remember(self, key, data):
+        if not self.memory_items or len(data) > self.memory_entry_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_size -= len(old)
+            self._memory[key] = data
+            self._memory_size += len(data)
+            while len(self._memory) > self.memory_items or self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def _hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def _miss(self):
+        with self._lock:
+            self.misses += 1
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def sized_lru_cache(maxsize, max_bytes, weigh):
+    """functools.lru_cache that also bounds the memory its entries hold.
+
+    ``weigh(args, result)`` estimates an entry's size in bytes; entries are
+    evicted least-recently-used first until both ``maxsize`` and ``max_bytes``
+    hold, and an entry larger than ``max_bytes`` is returned without being
+    kept. Positional arguments only. Like lru_cache, concurrent misses on one
+    key may both compute it.
+    """
+    def decorator(fn):
+        entries = OrderedDict()
+        lock = threading.Lock()
+        stats = {'hits': 0, 'misses': 0, 'bytes': 0}
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            with lock:
+                entry = entries.get(args)
+                if entry is not None:
+                    entries.move_to_end(args)
+                    stats['hits'] += 1
+                    return entry[0]
+                stats['misses'] += 1
+            result = fn(*args)
+            size = weigh(args, result)
+            if size > max_bytes:
+                return result
+            with lock:
+                old = entries.pop(args, None)
+                if old is not None:
+                    stats['bytes'] -= old[1]
+                entries[args] = (result, size)
+                stats['bytes'] += size
+                while len(entries) > maxsize or stats['bytes'] > max_bytes:
+                    _, (_, evicted) = entries.popitem(last=False)
+                    stats['bytes'] -= evicted
+            return result
+
+        def cache_info():
+            with lock:
+                return CacheInfo(stats['hits'], stats['misses'], maxsize, len(entries))
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+                stats.update(hits=0, misses=0, bytes=0)
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
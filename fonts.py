@@ -0,0 +1,110 @@
+# Font registry. TrueType faces are registered with ReportLab once per process
+# and get a precomputed glyph-width table, so measuring text does not go
+# through TTFont.stringWidth. ReportLab embeds TrueType fonts as subsets
+# holding only the glyphs a document uses, so Unicode fonts cost a few KB
+# per document rather than the whole font file.
+import logging
+import os
+import threading
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfbase.ttfonts import TTFont, TTFError
+
+logger = logging.getLogger(__name__)
+
+FONT_DIRS = [
+    os.environ.get('CURRICULO_FONT_DIR', ''),
+    'static/fonts',
+    '/usr/share/fonts/truetype/dejavu',
+    '/usr/share/fonts/dejavu',
+    '/usr/share/fonts/TTF',
+    '/Library/Fonts',
+    'C:\\Windows\\Fonts',
+]
+
+# face name -> TrueType file; families pair a regular face with its bold
+TTF_FACES = {
+    'DejaVuSans': 'DejaVuSans.ttf',
+    'DejaVuSans-Bold': 'DejaVuSans-Bold.ttf',
+    'Vera': 'Vera.ttf',  # ships with ReportLab
+    'Vera-Bold': 'VeraBd.ttf',
+}
+FAMILIES = {
+    'Helvetica': ('Helvetica', 'Helvetica-Bold'),
+    'DejaVuSans': ('DejaVuSans', 'DejaVuSans-Bold'),
+    'Vera': ('Vera', 'Vera-Bold'),
+}
+# Tried in order when a document has characters the built-in fonts cannot encode
+UNICODE_FAMILIES = ('DejaVuSans',)
+
+_lock = threading.Lock()
+_available = {}
+_width_tables = {}
+
+
+def find_font_file(filename):
+    for directory in FONT_DIRS:
+        if directory and os.path.exists(os.path.join(directory, filename)):
+            return os.path.join(directory, filename)
+    # TTFont also searches ReportLab's own font directory
+    return filename
+
+
+def ensure_font(face):
+    # Registers a face on first use; False when it cannot be loaded
+    if face in pdfmetrics.standardFonts:
+        return True
+    with _lock:
+        if face not in _available:
+            _available[face] = _register(face)
+        return _available[face]
+
+
+def _register(face):
+    filename = TTF_FACES.get(face)
+    if filename is None:
+        return False
+    try:
+        font = TTFont(face, find_font_file(filename))
+    except (TTFError, OSError) as e:
+        logger.warning("Font %s unavailable: %s", face, e)
+        return False
+    pdfmetrics.registerFont(font)
+    _width_tables[face] = (font.face.charWidths, font.face.defaultWidth)
+    return True
+
+
+def family_faces(family):
+    # (regular, bold) for a family, falling back to Helvetica when its files are missing
+    regular, bold = FAMILIES.get(family, FAMILIES['Helvetica'])
+    if ensure_font(regular) and ensure_font(bold):
+        return regular, bold
+    return FAMILIES['Helvetica']
+
+
+def needs_unicode(text):
+    # The built-in Type 1 fonts only cover WinAnsiEncoding
+    try:
+        text.encode('cp1252')
+    except UnicodeEncodeError:
+        return True
+    return False
+
+
+def document_faces(family, texts):
+    regular, bold = family_faces(family)
+    if regular in pdfmetrics.standardFonts and any(needs_unicode(text) for text in texts):
+        for unicode_family in UNICODE_FAMILIES:
+            faces = family_faces(unicode_family)
+            if faces != FAMILIES['Helvetica']:
+                return faces
+    return regular, bold
+
+
+def string_width(text, face, size):
+    table = _width_tables.get(face)
+    if table is None:
+        return stringWidth(text, face, size)
+    widths, default = table
+    return sum(widths.get(ord(char), default) for char in text) * 0.001 * size
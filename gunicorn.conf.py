@@ -0,0 +1,48 @@
+# Production startup: gunicorn -c gunicorn.conf.py app:app
+#
+# The app is imported and warmed up once in the master, then forked, so
+# workers start with ReportLab, PIL, font tables and templates already loaded
+# and serve their first request at steady-state latency.
+import os
+import time
+
+CONFIG_LOADED = time.perf_counter()
+
+# Startup and first-request timings are logged at INFO
+os.environ.setdefault('LOG_LEVEL', 'INFO')
+
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Threaded workers take requests in beyond what they can render at once, so
+# renders are admitted against RENDER_CAPACITY, queue behind it and are shed
+# with 503 past the queue (see admission.py). Sync workers leave the excess
+# in the listen backlog, where nothing can turn it away.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+
+def on_starting(server):
+    # /metrics sums the files workers leave in METRICS_FOLDER; start from none
+    from metrics import clear_process_files
+    clear_process_files()
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported, before any fork
+    import_seconds = time.perf_counter() - CONFIG_LOADED
+    from app import app
+    from warmup import warm_up
+    warm_up(app, import_seconds=import_seconds)
+
+
+def worker_exit(server, worker):
+    # Runs in the exiting worker: its last counts reach the merged totals
+    from metrics import REGISTRY
+    REGISTRY.save(force=True)
+
+
+def child_exit(server, worker):
+    # Runs in the master: the worker's gauges leave /metrics, its counters stay
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
@@ -0,0 +1,193 @@
+# Background render jobs. State lives in SQLite so any gunicorn worker can
+# answer status and download requests, while rendering happens in a small
+# thread pool inside the worker that accepted the job. That worker keeps a
+# heartbeat on its unfinished jobs; if it dies, they are marked failed once
+# the heartbeat goes stale instead of staying queued until they expire.
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+HEARTBEAT_SECONDS = 5
+STALE_SECONDS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    data TEXT NOT NULL,
+    photo BLOB,
+    filename TEXT,
+    error TEXT,
+    pdf BLOB,
+    owner INTEGER,
+    heartbeat REAL
+)
+"""
+# Columns added after the first version of the table
+MIGRATIONS = {'owner': "ALTER TABLE jobs ADD COLUMN owner INTEGER",
+              'heartbeat': "ALTER TABLE jobs ADD COLUMN heartbeat REAL"}
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class JobStore:
+    def __init__(self, path, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        db = self._connect()
+        # PDFs are deleted as jobs finish and expire; incremental auto-vacuum
+        # lets purge_expired hand the pages back instead of the file only
+        # growing. A database made without it is converted once.
+        db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            db.execute("VACUUM")
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(SCHEMA)
+        columns = {row['name'] for row in db.execute("PRAGMA table_info(jobs)")}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                db.execute(statement)
+
+    def _connect(self):
+        # sqlite3 connections must not be shared across threads, nor carried
+        # across a fork when gunicorn preloads the app
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def create(self, data, photo_bytes=None):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (id, status, created, updated, data, photo, owner, heartbeat)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, now, now, json.dumps(data, ensure_ascii=False), photo_bytes, os.getpid(), now))
+        return job_id
+
+    def beat(self):
+        # Called periodically by the process that owns unfinished jobs
+        self._connect().execute(
+            "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status IN (?, ?)",
+            (time.time(), os.getpid(), QUEUED, RUNNING))
+
+    def fail_stale(self, job_id=None):
+        # Unfinished jobs whose owner stopped beating: the worker died or was
+        # restarted, and nobody else will render them
+        now = time.time()
+        query = ("UPDATE jobs SET status = ?, error = ?, updated = ?"
+                 " WHERE status IN (?, ?) AND COALESCE(heartbeat, updated) < ?")
+        params = [FAILED, "o processo de geração foi encerrado antes de concluir", now, QUEUED, RUNNING,
+                  now - STALE_SECONDS]
+        if job_id is not None:
+            query += " AND id = ?"
+            params.append(job_id)
+        return self._connect().execute(query, params).rowcount
+
+    def load_input(self, job_id):
+        row = self._connect().execute("SELECT data, photo FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row['data']), row['photo']
+
+    def set_status(self, job_id, status, error=None):
+        self._connect().execute("UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?",
+                                (status, error, time.time(), job_id))
+
+    def finish(self, job_id, pdf_bytes, filename):
+        # The inputs are no longer needed once the PDF exists
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, pdf = ?, filename = ?, photo = NULL, updated = ? WHERE id = ?",
+            (DONE, pdf_bytes, filename, time.time(), job_id))
+
+    def status(self, job_id):
+        self.fail_stale(job_id)
+        row = self._connect().execute(
+            "SELECT id, status, created, updated, error FROM jobs WHERE id = ? AND created > ?",
+            (job_id, time.time() - self.ttl)).fetchone()
+        return dict(row) if row else None
+
+    def result(self, job_id):
+        row = self._connect().execute(
+            "SELECT pdf, filename FROM jobs WHERE id = ? AND status = ? AND created > ?",
+            (job_id, DONE, time.time() - self.ttl)).fetchone()
+        return (row['pdf'], row['filename']) if row else None
+
+    def purge_expired(self):
+        self.fail_stale()
+        db = self._connect()
+        purged = db.execute("DELETE FROM jobs WHERE created <= ?", (time.time() - self.ttl,)).rowcount
+        # execute() steps the pragma once, which frees a single page;
+        # executescript runs it to completion
+        db.executescript("PRAGMA incremental_vacuum;")
+        return purged
+
+
+class JobQueue:
+    def __init__(self, store, render, workers=2, max_pending=16):
+        # render(data, photo_bytes) -> (pdf_bytes, filename)
+        self.store = store
+        self.render = render
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='render-job')
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._heartbeat_pid = None
+
+    def submit(self, data, photo_bytes=None):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull("Fila de geração cheia")
+            self._pending += 1
+            # Started on first use in each process, not in a preloading master
+            if self._heartbeat_pid != os.getpid():
+                self._heartbeat_pid = os.getpid()
+                threading.Thread(target=self._heartbeat, name='render-job-heartbeat', daemon=True).start()
+        try:
+            self.store.purge_expired()
+            job_id = self.store.create(data, photo_bytes)
+            self._pool.submit(self._run, job_id)
+        except BaseException:
+            self._release()
+            raise
+        return job_id
+
+    def _run(self, job_id):
+        try:
+            self.store.set_status(job_id, RUNNING)
+            data, photo_bytes = self.store.load_input(job_id)
+            pdf_bytes, filename = self.render(data, photo_bytes)
+            self.store.finish(job_id, pdf_bytes, filename)
+        except Exception as e:
+            self.store.set_status(job_id, FAILED, error=str(e))
+        finally:
+            self._release()
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            if self._pending:
+                try:
+                    self.store.beat()
+                except sqlite3.Error:
+                    pass
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
@@ -0,0 +1,130 @@
+from functools import lru_cache
+from typing import NamedTuple
+
+from fonts import string_width
+
+
+class PlacedLine(NamedTuple):
+    text: str
+    y: float
+    new_page: bool  # True when a page break happens right before this line
+
+
+@lru_cache(maxsize=None)
+def space_width(font_name, font_size):
+    return string_width(' ', font_name, font_size)
+
+
+# Resume vocabulary repeats a lot, so word widths are memoized per (font, size)
+word_width = lru_cache(maxsize=16384)(string_width)
+
+
+def break_lines(text, max_width, font_name, font_size):
+    # Greedy wrapping on word widths: every word is measured at most once and the line
+    # width is a running sum, so a paragraph costs O(words) instead of
+    # re-measuring the whole growing line for each word.
+    # A word wider than max_width still gets a line of its own.
+    space = space_width(font_name, font_size)
+    lines = []
+    current = []
+    current_width = 0.0
+    for word in text.split():
+        width = word_width(word, font_name, font_size)
+        if not current:
+            current.append(word)
+            current_width = width
+        elif current_width + space + width > max_width:
+            lines.append(' '.join(current))
+            current = [word]
+            current_width = width
+        else:
+            current.append(word)
+            current_width += space + width
+    if current:
+        lines.append(' '.join(current))
+    return lines
+
+
+def place_lines(lines, y, line_height, top, bottom):
+    # Steps down one line before each line is placed and starts a new page at
+    # `top` once the baseline would fall below `bottom`
+    placed = []
+    for text in lines:
+        y -= line_height
+        new_page = y < bottom
+        if new_page:
+            y = top
+        placed.append(PlacedLine(text, y, new_page))
+    return placed, y
+
+
+def layout_text(text, y, max_width, font_name, font_size, line_height, top, bottom):
+    # Lays out newline-separated paragraphs; blank paragraphs add half a line
+    placed = []
+    for para in text.split("\n"):
+        if not para.strip():
+            y -= line_height * 0.5
+            continue
+        para_lines, y = place_lines(break_lines(para, max_width, font_name, font_size),
+                                    y, line_height, top, bottom)
+        placed.extend(para_lines)
+    return placed, y
+
+
+class Row(NamedTuple):
+    # One entry of a position-independent layout: what to draw and how far
+    # down it sits from the previous row. Only rows that `breaks` may start a
+    # new page; gaps just move y. A row that `keeps` with the next one (a
+    # heading) moves to the next page unless the next breaking row fits too.
+    kind: str
+    text: str
+    step: float
+    breaks: bool
+    keeps: bool = False
+
+
+def gap(amount):
+    return Row('gap', '', amount, False)
+
+
+def wrap_rows(text, max_width, font_name, font_size, line_height, kind):
+    # layout_text without a position: blank paragraphs become half-line gaps
+    rows = []
+    for para in text.split("\n"):
+        if not para.strip():
+            rows.append(gap(line_height * 0.5))
+            continue
+        rows.extend(Row(kind, line, line_height, True)
+                    for line in break_lines(para, max_width, font_name, font_size))
+    return rows
+
+
+class PlacedRow(NamedTuple):
+    row: Row
+    y: float
+    new_page: bool
+
+
+def keep_distance(rows, index):
+    # How far below rows[index] the next breaking row lands, if it keeps with it
+    if not rows[index].keeps:
+        return 0
+    distance = 0
+    for row in rows[index + 1:]:
+        distance += row.step
+        if row.breaks:
+            break
+    return distance
+
+
+def place_rows(rows, y, top, bottom):
+    # Places a row layout starting at y, like place_lines; gaps are consumed here
+    placed = []
+    for index, row in enumerate(rows):
+        y -= row.step
+        new_page = row.breaks and y - keep_distance(rows, index) < bottom
+        if new_page:
+            y = top
+        if row.kind != 'gap':
+            placed.append(PlacedRow(row, y, new_page))
+    return placed, y
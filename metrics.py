@@ -0,0 +1,285 @@
+# Minimal in-process Prometheus metrics: counters, histograms and the text
+# exposition format for /metrics. Values are kept per process; each gunicorn
+# worker writes its exposition to METRICS_FOLDER/<pid>.prom, and /metrics
+# merges every file, like prometheus_client's multiprocess mode: counters and
+# histograms are summed across workers (dead ones included, so totals never
+# go down), gauges are reported per live worker with a pid label.
+import glob
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+METRICS_FOLDER = os.environ.get('METRICS_FOLDER', 'cache/metrics')
+# Longest a worker's file lags behind its own values between scrapes
+SAVE_INTERVAL = 1.0
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, '') for name in self.labelnames), 0)
+
+    def expose(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f'{self.name}{_label_text(self.labelnames, key)} {value}'
+
+
+class Gauge(Counter):
+    def set(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def expose(self):
+        for line in super().expose():
+            yield line.replace(' counter', ' gauge') if line.startswith('# TYPE') else line
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def expose(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._values.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _label_text(self.labelnames + ('le',), key + (le,))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _label_text(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {series[-1]}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Registry:
+    def __init__(self, folder=METRICS_FOLDER):
+        self.folder = folder
+        self._metrics = []
+        self._collectors = []
+        self._saved = 0.0
+        self._save_lock = threading.Lock()
+        self._timer = None
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, labelnames=()):
+        metric = Gauge(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        # fn() yields ready-made exposition lines for values kept elsewhere
+        self._collectors.append(fn)
+        return fn
+
+    def reset(self):
+        # Drops recorded values, e.g. those produced by a warm-up render in the
+        # gunicorn master, which every forked worker would otherwise inherit
+        for metric in self._metrics:
+            with metric._lock:
+                metric._values.clear()
+
+    def expose(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return '\n'.join(lines) + '\n'
+
+    def save(self, force=False):
+        # Writes this process's values for the other workers to merge, at
+        # most once per SAVE_INTERVAL unless forced. A skipped save is made
+        # up by a timer, so an idle worker's last counts still land within
+        # SAVE_INTERVAL.
+        with self._save_lock:
+            now = time.monotonic()
+            if not force and now - self._saved < SAVE_INTERVAL:
+                if self._timer is None:
+                    self._timer = threading.Timer(self._saved + SAVE_INTERVAL - now, self._save_later)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            os.makedirs(self.folder, exist_ok=True)
+            path = os.path.join(self.folder, f'{os.getpid()}.prom')
+            with open(path + '.tmp', 'w') as f:
+                f.write(self.expose())
+            os.replace(path + '.tmp', path)
+            self._saved = now
+
+    def _save_later(self):
+        with self._save_lock:
+            self._timer = None
+        self.save(force=True)
+
+    def expose_all(self):
+        # Exposition merged across every worker that saved into the folder
+        self.save(force=True)
+        families = {}
+        for path in sorted(glob.glob(os.path.join(self.folder, '*.prom'))):
+            pid, _, state = os.path.basename(path)[:-len('.prom')].partition('.')
+            try:
+                with open(path) as f:
+                    _merge(families, f.read(), pid, live=state != 'dead')
+            except FileNotFoundError:
+                continue
+        lines = []
+        for name, (documentation, kind, samples) in families.items():
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(f'{key} {value}' for key, value in samples.items())
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(families, text, pid, live):
+    # Adds one worker's exposition into families:
+    # {name: (help, type, {sample with labels: value})}
+    documentation = ''
+    family = None
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            documentation = line.split(' ', 3)[3]
+        elif line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            family = families.setdefault(name, (documentation, kind, {}))
+        elif line and family is not None:
+            key, _, text_value = line.rpartition(' ')
+            try:
+                value = int(text_value)
+            except ValueError:
+                value = float(text_value)
+            samples = family[2]
+            if family[1] == 'gauge':
+                # A dead worker's gauges describe nothing that still exists
+                if live:
+                    key = key[:-1] + f',pid="{pid}"}}' if key.endswith('}') else key + f'{{pid="{pid}"}}'
+                    samples[key] = value
+            else:
+                samples[key] = samples.get(key, 0) + value
+
+
+def mark_process_dead(pid, folder=METRICS_FOLDER):
+    # Called by the gunicorn master for each worker that exits
+    path = os.path.join(folder, f'{pid}.prom')
+    try:
+        os.replace(path, os.path.join(folder, f'{pid}.dead.prom'))
+    except FileNotFoundError:
+        pass
+
+
+def clear_process_files(folder=METRICS_FOLDER):
+    # Files left by an earlier run would be summed into this one's counters
+    for path in glob.glob(os.path.join(folder, '*.prom')):
+        os.remove(path)
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter('curriculo_requests_total', 'HTTP requests handled.', ('endpoint', 'status'))
+REQUEST_SECONDS = REGISTRY.histogram('curriculo_request_seconds', 'Time to handle a request, up to the response being ready to send.',
+                                     ('endpoint',))
+STAGE_SECONDS = REGISTRY.histogram('curriculo_stage_seconds', 'Time spent in each render stage.', ('stage',))
+PAGES = REGISTRY.counter('curriculo_pages_total', 'PDF pages rendered.')
+PDF_SIZE = REGISTRY.histogram('curriculo_pdf_size_bytes', 'Size of rendered PDFs by output mode.', ('mode',),
+                              buckets=(8192, 16384, 32768, 65536, 131072, 262144, 524288, 1048576, 4194304))
+BYTES_OUT = REGISTRY.counter('curriculo_pdf_bytes_total', 'PDF bytes sent to clients, ZIPs of PDFs included.')
+RENDER_QUEUE_SECONDS = REGISTRY.histogram('curriculo_render_queue_seconds', 'Time renders waited for admission.')
+RENDER_REJECTED = REGISTRY.counter('curriculo_render_rejected_total', 'Renders turned away with 503, by reason.',
+                                   ('reason',))
+RENDER_CANCELLED = REGISTRY.counter('curriculo_render_cancelled_total',
+                                    'Renders dropped because the client disconnected, by stage.', ('stage',))
+STARTUP_SECONDS = REGISTRY.gauge('curriculo_startup_seconds', 'Cold-start phases: import, warmup, first_request.',
+                                 ('phase',))
+
+
+def cache_collector(caches):
+    # caches: {label: TieredCache or lru_cache-wrapped function}; both count
+    # their own hits and misses
+    def collect():
+        yield '# HELP curriculo_cache_total Cache lookups by cache and result.'
+        yield '# TYPE curriculo_cache_total counter'
+        for name, cache in sorted(caches.items()):
+            stats = cache.cache_info() if hasattr(cache, 'cache_info') else cache
+            yield f'curriculo_cache_total{{cache="{name}",result="hit"}} {stats.hits}'
+            yield f'curriculo_cache_total{{cache="{name}",result="miss"}} {stats.misses}'
+    return collect
+
+
+def admission_collector(gate):
+    # Live state of an admission.RenderGate: budget, cost in use, queue depth
+    def collect():
+        for name, documentation, value in (
+                ('curriculo_render_capacity', 'Render cost budget per worker (see render.render_cost).', gate.capacity),
+                ('curriculo_render_in_use', 'Estimated cost of the renders running now.', gate.in_use),
+                ('curriculo_render_queue_depth', 'Renders waiting for admission.', gate.waiting)):
+            yield f'# HELP {name} {documentation}'
+            yield f'# TYPE {name} gauge'
+            yield f'{name} {value}'
+    return collect
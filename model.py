@@ -0,0 +1,202 @@
+# Typed resume model. Form posts, batch records and JSON API bodies are
+# parsed into it once; the PDF renderer, the HTML preview and the cache key
+# all read the same objects, so nothing is joined into a string and split
+# back apart on the way to the page.
+from dataclasses import dataclass
+
+CONTACT_FIELDS = ('email', 'telefone', 'endereco', 'linkedin', 'github')
+TEXT_FIELDS = ('resumo', 'escolaridade', 'cursos', 'certificacoes', 'projetos')
+
+SECCOES = [
+    ('Resumo Profissional', 'resumo'),
+    ('Habilidades Técnicas', 'habilidades'),
+    ('Experiência Profissional', 'experiencia'),
+    ('Formação Acadêmica', 'escolaridade'),
+    ('Cursos Complementares', 'cursos'),
+    ('Certificações', 'certificacoes'),
+    ('Projetos Relevantes', 'projetos')
+]
+
+
+class ResumeError(ValueError):
+    pass
+
+
+def clean(value, campo='texto'):
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ResumeError(f"{campo} deve ser texto")
+    return value.replace('\r\n', '\n').strip()
+
+
+def bullet_lines(value, campo='texto'):
+    # One item per line (or per list element), without a leading bullet
+    if isinstance(value, (list, tuple)):
+        lines = [clean(line, campo) for line in value]
+    else:
+        lines = clean(value, campo).split('\n')
+    return tuple(line.lstrip('•').strip() for line in lines if line.strip().lstrip('•').strip())
+
+
+def flag(value):
+    # Checkbox or JSON boolean
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'on', 'true', 'sim')
+    return bool(value)
+
+
+def skill_list(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(skill for skill in (clean(skill, 'habilidades') for skill in value) if skill)
+    return tuple(skill.strip() for skill in clean(value, 'habilidades').split(',') if skill.strip())
+
+
+@dataclass(frozen=True, slots=True)
+class Contact:
+    nome: str = ''
+    email: str = ''
+    telefone: str = ''
+    endereco: str = ''
+    linkedin: str = ''
+    github: str = ''
+
+    def details(self):
+        # Filled contact fields in sidebar order
+        return [getattr(self, campo) for campo in CONTACT_FIELDS if getattr(self, campo)]
+
+
+@dataclass(frozen=True, slots=True)
+class Experience:
+    empresa: str = ''
+    cargo: str = ''
+    periodo: str = ''
+    responsabilidades: tuple = ()
+    conquistas: tuple = ()
+
+    @property
+    def header(self):
+        if self.empresa and self.cargo and self.periodo:
+            return f"{self.empresa} - {self.cargo} ({self.periodo})"
+        if self.empresa and self.cargo:
+            return f"{self.empresa} - {self.cargo}"
+        return self.empresa or self.cargo
+
+    @property
+    def bullets(self):
+        return self.responsabilidades + self.conquistas
+
+
+@dataclass(frozen=True, slots=True)
+class Section:
+    titulo: str
+    campo: str
+    text: str = ''
+    skills: tuple = ()
+    experiences: tuple = ()
+
+
+@dataclass(frozen=True, slots=True)
+class Resume:
+    contact: Contact = Contact()
+    resumo: str = ''
+    habilidades: tuple = ()
+    experiences: tuple = ()
+    escolaridade: str = ''
+    cursos: str = ''
+    certificacoes: str = ''
+    projetos: str = ''
+    paleta: str = ''
+    # Output option: smaller PDF with a downsampled JPEG photo
+    compacto: bool = False
+
+    @classmethod
+    def from_form(cls, form):
+        # `form` is anything with a dict-like .get holding the flat form
+        # fields: request.form, a batch record. Experiences come numbered
+        # empresa1, cargo1, ... and end at the first entirely empty one.
+        experiences = []
+        i = 1
+        while True:
+            fields = {campo: form.get(f'{campo}{i}', '')
+                      for campo in ('empresa', 'cargo', 'periodo', 'responsabilidades', 'conquistas')}
+            experience = Experience(
+                empresa=clean(fields['empresa'], 'empresa'),
+                cargo=clean(fields['cargo'], 'cargo'),
+                periodo=clean(fields['periodo'], 'periodo'),
+                responsabilidades=bullet_lines(fields['responsabilidades'], 'responsabilidades'),
+                conquistas=bullet_lines(fields['conquistas'], 'conquistas'))
+            if not (experience.empresa or experience.cargo or experience.bullets):
+                break
+            # Bullets without a company or position to hang them on are dropped
+            if experience.empresa or experience.cargo:
+                experiences.append(experience)
+            i += 1
+        return cls._build(form, form.get('habilidades', ''), experiences)
+
+    @classmethod
+    def from_json(cls, obj):
+        # The structured form /api/gerar accepts and to_json produces:
+        # {"nome": ..., "habilidades": [...], "experiencias": [{"empresa": ...,
+        #  "responsabilidades": [...]}], ...}
+        if not isinstance(obj, dict):
+            raise ResumeError("o currículo deve ser um objeto JSON")
+        experiencias = obj.get('experiencias') or []
+        if not isinstance(experiencias, list) or not all(isinstance(item, dict) for item in experiencias):
+            raise ResumeError("experiencias deve ser uma lista de objetos")
+        experiences = [
+            Experience(
+                empresa=clean(item.get('empresa'), 'empresa'),
+                cargo=clean(item.get('cargo'), 'cargo'),
+                periodo=clean(item.get('periodo'), 'periodo'),
+                responsabilidades=bullet_lines(item.get('responsabilidades') or '', 'responsabilidades'),
+                conquistas=bullet_lines(item.get('conquistas') or '', 'conquistas'))
+            for item in experiencias
+        ]
+        return cls._build(obj, obj.get('habilidades') or '', experiences)
+
+    @classmethod
+    def _build(cls, source, habilidades, experiences):
+        contact = Contact(**{campo: clean(source.get(campo), campo) for campo in ('nome',) + CONTACT_FIELDS})
+        return cls(contact=contact, habilidades=skill_list(habilidades), experiences=tuple(experiences),
+                   paleta=clean(source.get('paleta'), 'paleta'), compacto=flag(source.get('compacto')),
+                   **{campo: clean(source.get(campo), campo) for campo in TEXT_FIELDS})
+
+    def to_json(self):
+        obj = {campo: getattr(self.contact, campo) for campo in ('nome',) + CONTACT_FIELDS}
+        obj.update({campo: getattr(self, campo) for campo in TEXT_FIELDS})
+        obj['habilidades'] = list(self.habilidades)
+        obj['experiencias'] = [
+            {'empresa': e.empresa, 'cargo': e.cargo, 'periodo': e.periodo,
+             'responsabilidades': list(e.responsabilidades), 'conquistas': list(e.conquistas)}
+            for e in self.experiences
+        ]
+        obj['paleta'] = self.paleta
+        obj['compacto'] = self.compacto
+        return obj
+
+    def texts(self):
+        # Every string that ends up on the page, for picking a font that covers them
+        yield self.contact.nome
+        yield from self.contact.details()
+        for campo in TEXT_FIELDS:
+            yield getattr(self, campo)
+        yield from self.habilidades
+        for experience in self.experiences:
+            yield experience.header
+            yield from experience.bullets
+
+    def sections(self):
+        # What the PDF renderer and the HTML preview draw, in order; empty
+        # sections are left out
+        sections = []
+        for titulo, campo in SECCOES:
+            if campo == 'habilidades':
+                if self.habilidades:
+                    sections.append(Section(titulo, campo, skills=self.habilidades))
+            elif campo == 'experiencia':
+                if self.experiences:
+                    sections.append(Section(titulo, campo, experiences=self.experiences))
+            elif getattr(self, campo):
+                sections.append(Section(titulo, campo, text=getattr(self, campo)))
+        return sections
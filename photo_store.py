@@ -0,0 +1,47 @@
+import hashlib
+import os
+
+from cache_store import TieredCache
+
+
+class PhotoStore:
+    """Content-addressed store for the circular crops of uploaded photos.
+
+    Processed PNGs are keyed by the SHA-256 of the uploaded bytes, so the same
+    photo is processed once. The upload itself is decoded in memory and never
+    written to disk. Compact JPEG variants depend on the background they are
+    flattened onto as well, and are kept apart under ``compact/``.
+    """
+
+    def __init__(self, root, process, compact=None, memory_items=64, disk_bytes=256 * 1024 * 1024,
+                 ttl=7 * 24 * 3600):
+        self.process = process
+        self.compact = compact
+        self.circles = TieredCache(os.path.join(root, 'circle'), suffix='.png',
+                                   memory_items=memory_items, disk_bytes=disk_bytes, ttl=ttl)
+        self.compacts = TieredCache(os.path.join(root, 'compact'), suffix='.jpg',
+                                    memory_items=memory_items, disk_bytes=disk_bytes, ttl=ttl)
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def circle_image(self, data):
+        key = self.digest(data)
+        png = self.circles.get(key)
+        if png is None:
+            png = self.process(data)
+            self.circles.put(key, png)
+        return key, png
+
+    def compact_image(self, data, background):
+        # `background` is the 'rrggbb' colour the photo is flattened onto
+        key = f'{self.digest(data)}-{background}'
+        jpeg = self.compacts.get(key)
+        if jpeg is None:
+            jpeg = self.compact(data, background)
+            self.compacts.put(key, jpeg)
+        return key, jpeg
+
+    def gc(self):
+        return self.circles.gc() + self.compacts.gc()
@@ -0,0 +1,660 @@
+# Everything needed to turn form data into a PDF, with no Flask request
+# context, so the web routes, the batch CLI and pool workers share it
+import io
+import hashlib
+import json
+import logging
+from dataclasses import replace
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from reportlab.lib import colors
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from PIL import Image, ImageDraw
+from cache_store import sized_lru_cache
+from photo_store import PhotoStore
+from model import Resume
+from layout import Row, break_lines, gap, layout_text, place_lines, place_rows, wrap_rows
+from fonts import document_faces, string_width
+from metrics import STAGE_SECONDS, PAGES, PDF_SIZE
+
+logger = logging.getLogger(__name__)
+
+# PDFs are served and stored as binary files, so streams skip the ASCII85
+# layer that would make every compressed stream a quarter larger
+rl_config.useA85 = 0
+
+# Processed photos are private to the request that uploaded them, so they
+# are kept next to the PDF cache rather than anywhere /static serves
+PHOTO_CACHE_FOLDER = 'cache/photos'
+
+# Uploads are decoded in memory, so bound them before PIL ever sees the bytes
+MAX_PHOTO_BYTES = 8 * 1024 * 1024
+MAX_PHOTO_PIXELS = 40_000_000
+PHOTO_SIZE = (200, 200)
+
+# Compact output: the photo is drawn 3.6 cm wide, so it is resampled to this
+# DPI at that size and embedded as a JPEG flattened onto the sidebar colour
+COMPACT_PHOTO_DPI = 100
+COMPACT_PHOTO_QUALITY = 80
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+SIDEBAR_WIDTH = 6*cm
+CONTENT_WIDTH = PAGE_WIDTH - SIDEBAR_WIDTH - 2*cm
+MARGIN_TOP = PAGE_HEIGHT - 2*cm
+MARGIN_BOTTOM = 2*cm
+LINE_HEIGHT = 16
+
+COLOR_PALETTES = {
+    'professional': {
+        'primary': colors.HexColor("#dc2626"),      # Professional red
+        'secondary': colors.HexColor("#f59e0b"),    # Warm yellow accent
+        'text': colors.HexColor("#374151"),         # Dark gray text
+        'light_bg': colors.HexColor("#fef2f2"),     # Light pink background
+        'white': colors.white,
+        'border': colors.HexColor("#e5e7eb"),       # Light border
+        'muted': colors.HexColor("#6b7280"),        # Muted gray
+        'font_family': 'Helvetica'                  # Any family in fonts.FAMILIES
+    },
+    'corporate': {
+        'primary': colors.HexColor("#1e40af"),      # Corporate blue
+        'secondary': colors.HexColor("#0891b2"),    # Cyan accent
+        'text': colors.HexColor("#374151"),         # Dark gray text
+        'light_bg': colors.HexColor("#eff6ff"),     # Light blue background
+        'white': colors.white,
+        'border': colors.HexColor("#e5e7eb"),       # Light border
+        'muted': colors.HexColor("#6b7280"),        # Muted gray
+        'font_family': 'Helvetica'                  # Any family in fonts.FAMILIES
+    },
+    'modern': {
+        'primary': colors.HexColor("#7c3aed"),      # Modern purple
+        'secondary': colors.HexColor("#06b6d4"),    # Bright cyan
+        'text': colors.HexColor("#374151"),         # Dark gray text
+        'light_bg': colors.HexColor("#f3f4f6"),     # Light gray background
+        'white': colors.white,
+        'border': colors.HexColor("#e5e7eb"),       # Light border
+        'muted': colors.HexColor("#6b7280"),        # Muted gray
+        'font_family': 'Helvetica'                  # Any family in fonts.FAMILIES
+    },
+    'elegant': {
+        'primary': colors.HexColor("#059669"),      # Elegant green
+        'secondary': colors.HexColor("#d97706"),    # Warm orange
+        'text': colors.HexColor("#374151"),         # Dark gray text
+        'light_bg': colors.HexColor("#f0fdf4"),     # Light green background
+        'white': colors.white,
+        'border': colors.HexColor("#e5e7eb"),       # Light border
+        'muted': colors.HexColor("#6b7280"),        # Muted gray
+        'font_family': 'Helvetica'                  # Any family in fonts.FAMILIES
+    }
+}
+
+class PhotoRejected(ValueError):
+    def __init__(self, message, status=413):
+        super().__init__(message)
+        self.status = status
+
+def _circle_mask(size):
+    mask = Image.new('L', size, 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse((0,0)+size, fill=255)
+    return mask
+
+CIRCLE_MASK = _circle_mask(PHOTO_SIZE)
+
+def open_photo(image_bytes, size):
+    # Decoded RGB upload resized to `size`, after the size checks
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+    except (OSError, Image.DecompressionBombError):
+        # OSError covers UnidentifiedImageError and headers cut short
+        raise PhotoRejected("Arquivo de foto inválido", status=400)
+
+    # Image.open only parses the header, so the pixel limit is checked before decoding
+    width, height = img.size
+    if width * height > MAX_PHOTO_PIXELS:
+        raise PhotoRejected("Foto com resolução muito alta")
+
+    # A truncated or corrupt file only fails once its pixels are decoded
+    try:
+        # JPEGs are decoded at the smallest DCT scale that still covers the target size
+        img.draft('RGB', size)
+        return img.convert("RGB").resize(size, reducing_gap=3.0)
+    except (OSError, Image.DecompressionBombError):
+        raise PhotoRejected("Arquivo de foto inválido", status=400)
+
+def create_circle_image(image_bytes):
+    img = open_photo(image_bytes, PHOTO_SIZE)
+    img.putalpha(CIRCLE_MASK)
+
+    png = io.BytesIO()
+    img.save(png, format='PNG')
+    return png.getvalue()
+
+COMPACT_PHOTO_SIZE = (round(3.6 / 2.54 * COMPACT_PHOTO_DPI),) * 2
+COMPACT_CIRCLE_MASK = _circle_mask(COMPACT_PHOTO_SIZE)
+
+def create_compact_photo(image_bytes, background):
+    # No alpha channel: the corners outside the circle are painted in the
+    # sidebar colour (`background`, 'rrggbb') and the result stored as JPEG
+    img = open_photo(image_bytes, COMPACT_PHOTO_SIZE)
+    flat = Image.new('RGB', COMPACT_PHOTO_SIZE, '#' + background)
+    flat.paste(img, mask=COMPACT_CIRCLE_MASK)
+
+    jpeg = io.BytesIO()
+    flat.save(jpeg, format='JPEG', quality=COMPACT_PHOTO_QUALITY, optimize=True)
+    return jpeg.getvalue()
+
+# Processed photos are keyed by the upload's hash, so every request gets its
+# own image and repeat uploads never reach PIL
+photo_store = PhotoStore(PHOTO_CACHE_FOLDER, create_circle_image, create_compact_photo)
+
+# Part of every cached PDF's key. Bump it whenever the layout changes so
+# stale documents are not served.
+RENDER_VERSION = 5
+
+def resume_cache_key(resume, photo_digest='', variant=''):
+    # `variant` tells apart other documents made from the same resume (the
+    # palette sheet); the plain PDF keeps the key it always had
+    palette = resume.paleta if resume.paleta in COLOR_PALETTES else 'professional'
+    key = [RENDER_VERSION, resume.to_json(), palette, photo_digest] + ([variant] if variant else [])
+    payload = json.dumps(key, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def start_new_page(pdf, colors_palette):
+    pdf.showPage()
+    draw_sidebar(pdf, foto=None, contact=None, colors_palette=colors_palette)
+    return MARGIN_TOP
+
+def draw_lines(pdf, placed, x, font_name, font_size, color, colors_palette):
+    for line in placed:
+        if line.new_page:
+            start_new_page(pdf, colors_palette)
+            pdf.setFont(font_name, font_size)
+            pdf.setFillColor(color)
+        pdf.drawString(x, line.y, line.text)
+
+def draw_wrapped_text(pdf, text, x, y, max_width, font_name=None, font_size=11, line_height=16, color=None, colors_palette=None):
+    COLORS = colors_palette or document_palette()
+    font_name = font_name or COLORS['font']
+    if color is None:
+        color = COLORS['text']
+        
+    pdf.setFont(font_name, font_size)
+    pdf.setFillColor(color)
+    placed, y = layout_text(text, y, max_width, font_name, font_size, line_height, MARGIN_TOP, MARGIN_BOTTOM)
+    draw_lines(pdf, placed, x, font_name, font_size, color, COLORS)
+    return y
+
+def draw_wrapped_text_sidebar(pdf, text, x, y, max_width, font_name=None, font_size=10, line_height=14, colors_palette=None):
+    COLORS = colors_palette or document_palette()
+    font_name = font_name or COLORS['font']
+    
+    pdf.setFont(font_name, font_size)
+    pdf.setFillColor(COLORS['white'])
+    # The sidebar never paginates, so lines are placed against a zero bottom margin
+    placed, y = place_lines(break_lines(text, max_width, font_name, font_size), y, line_height, MARGIN_TOP, 0)
+    for line in placed:
+        pdf.drawString(x, line.y, line.text)
+    return y
+
+# Emitting the sidebar chrome once as a form XObject and referencing it per page
+# measured larger and slower than drawing it inline (see
+# benchmarks/bench_sidebar.py): with compressed page streams the two rects cost
+# less than the per-page XObject resource entry. Kept switchable for re-measuring.
+SIDEBAR_AS_FORM = False
+
+def draw_sidebar_chrome(pdf, colors_palette):
+    name = "SB" + colors_palette['text'].hexval()[2:] + colors_palette['primary'].hexval()[2:]
+    if SIDEBAR_AS_FORM and pdf.hasForm(name):
+        pdf.doForm(name)
+        return
+    if SIDEBAR_AS_FORM:
+        pdf.beginForm(name, upperx=SIDEBAR_WIDTH, uppery=PAGE_HEIGHT)
+    
+    # Main sidebar background
+    pdf.setFillColor(colors_palette['text'])
+    pdf.rect(0, 0, SIDEBAR_WIDTH, PAGE_HEIGHT, fill=1)
+    
+    # Red accent stripe
+    pdf.setFillColor(colors_palette['primary'])
+    pdf.rect(0, 0, 0.4*cm, PAGE_HEIGHT, fill=1)
+    
+    if SIDEBAR_AS_FORM:
+        pdf.endForm()
+        pdf.doForm(name)
+
+# Layout caches are keyed by the text they lay out, which can run to
+# megabytes per field, so they are bounded by size as well as by count
+NAME_CACHE_BYTES = 4 * 1024 * 1024
+LAYOUT_CACHE_BYTES = 32 * 1024 * 1024
+# Rough memory per laid-out row or name line, text aside
+ROW_BYTES = 150
+
+@sized_lru_cache(1024, NAME_CACHE_BYTES, lambda args, fitted: len(args[0]) * 2 + ROW_BYTES * len(fitted[1]))
+def fit_name(nome, font_bold):
+    # How the name is set in the sidebar: (font size, [(line, width)], step
+    # after each line, extra space after the name)
+    # Start with larger font and reduce if needed
+    font_size = 18
+    max_width = SIDEBAR_WIDTH - 1*cm
+    name_width = string_width(nome, font_bold, font_size)
+
+    # Name is too long - try smaller font first
+    while name_width > max_width and font_size > 12:
+        font_size -= 1
+        name_width = string_width(nome, font_bold, font_size)
+    if name_width <= max_width:
+        return font_size, ((nome, name_width),), 2*cm, 0
+
+    # Even small font doesn't work - split into lines intelligently, at a
+    # readable font size. Two words or less go on separate lines; more
+    # words are grouped.
+    words = nome.split()
+    lines = words if len(words) <= 2 else break_lines(nome, max_width, font_bold, 14)
+    return 14, tuple((line, string_width(line, font_bold, 14)) for line in lines), 0.8*cm, 1.2*cm
+
+def draw_sidebar(pdf, foto=None, contact=None, colors_palette=None):
+    COLORS = colors_palette or document_palette()
+    
+    draw_sidebar_chrome(pdf, COLORS)
+    
+    y = PAGE_HEIGHT - 1.5*cm
+
+    # Photo section with elegant frame
+    if foto:
+        pdf.drawImage(foto, SIDEBAR_WIDTH/2-1.8*cm, y-4.6*cm, width=3.6*cm, height=3.6*cm, mask='auto')
+        
+        # Red border around photo only, drawn over the corners of a
+        # flattened compact photo
+        pdf.setStrokeColor(COLORS['primary'])
+        pdf.setLineWidth(3)
+        pdf.circle(SIDEBAR_WIDTH/2, y-2.8*cm, 2.0*cm, fill=0)
+        y -= 6*cm
+    else:
+        y -= 1*cm
+
+    if contact and contact.nome:
+        font_size, lines, line_step, after = fit_name(contact.nome, COLORS['font_bold'])
+        pdf.setFillColor(COLORS['white'])
+        pdf.setFont(COLORS['font_bold'], font_size)
+        # Each line centered
+        for line, line_width in lines:
+            pdf.drawString((SIDEBAR_WIDTH - line_width)/2, y, line)
+            y -= line_step
+        y -= after
+
+    # Contact section with modern styling
+    if contact:
+        y -= 0.5*cm
+        
+        # Section header with red background
+        pdf.setFillColor(COLORS['primary'])
+        pdf.rect(0.3*cm, y-0.3*cm, SIDEBAR_WIDTH-0.6*cm, 0.8*cm, fill=1)
+        
+        pdf.setFont(COLORS['font_bold'], 12)
+        pdf.setFillColor(COLORS['white'])
+        pdf.drawString(0.7*cm, y, "CONTATO")
+        y -= 1.2*cm
+        
+        # Contact items with better spacing and icons
+        for value in contact.details():
+            # Small yellow accent dot
+            pdf.setFillColor(COLORS['secondary'])
+            pdf.circle(0.7*cm, y+0.15*cm, 0.08*cm, fill=1)
+            
+            pdf.setFont(COLORS['font'], 9)
+            pdf.setFillColor(COLORS['white'])
+            pdf.drawString(1.2*cm, y, value)
+            y -= 0.7*cm
+
+def draw_section_header(pdf, title, y, x=None, colors_palette=None):
+    COLORS = colors_palette or document_palette()
+    
+    if x is None:
+        x = SIDEBAR_WIDTH + 1*cm
+    
+    # Title text in primary color
+    pdf.setFont(COLORS['font_bold'], 14)
+    pdf.setFillColor(COLORS['primary'])
+    pdf.drawString(x, y, title)
+    
+    # Horizontal line below title
+    pdf.setStrokeColor(COLORS['primary'])
+    pdf.setLineWidth(1)
+    title_width = string_width(title, COLORS['font_bold'], 14)
+    pdf.line(x, y-0.3*cm, x + title_width + 1*cm, y-0.3*cm)
+    
+    return y - 1*cm
+
+def draw_experience_item(pdf, experience_text, x, y, max_width, colors_palette=None):
+    COLORS = colors_palette or document_palette()
+    
+    parts = experience_text.strip().split('|')
+    if len(parts) >= 2:
+        position = parts[0].strip()
+        company_period = ' | '.join(parts[1:]).strip()
+        
+        # Position title in red
+        pdf.setFont(COLORS['font_bold'], 12)
+        pdf.setFillColor(COLORS['primary'])
+        y = draw_wrapped_text(pdf, position, x, y, max_width, font_name=COLORS['font_bold'], font_size=12, color=COLORS['primary'], colors_palette=COLORS)
+        
+        # Company and period in smaller text
+        pdf.setFont(COLORS['font'], 10)
+        pdf.setFillColor(COLORS['muted'])
+        y = draw_wrapped_text(pdf, company_period, x, y, max_width, font_name=COLORS['font'], font_size=10, color=COLORS['muted'], colors_palette=COLORS)
+        
+        # Subtle separator line
+        pdf.setStrokeColor(COLORS['border'])
+        pdf.setLineWidth(0.5)
+        pdf.line(x, y-0.3*cm, x+max_width*0.3, y-0.3*cm)
+        
+    return y - 0.8*cm
+
+def parse_form_data(form):
+    # `form` is anything with a dict-like .get: request.form, a batch record
+    resume = Resume.from_form(form)
+    logger.debug("Processed %d dynamic experiences", len(resume.experiences))
+    return resume
+
+# Font and size per text style of a section layout, as COLORS keys
+ROW_STYLES = {'text': ('font', 11), 'header': ('font_bold', 12)}
+
+@sized_lru_cache(1024, LAYOUT_CACHE_BYTES, lambda args, rows: len(repr(args[0])) + ROW_BYTES * len(rows))
+def section_layout(section, font, font_bold, width):
+    # Everything about a section that does not depend on where it starts:
+    # wrapped lines, bullets and spacing. Sections are immutable, so the
+    # cache keys on their content plus the faces and width they are laid out
+    # with, and a regeneration after an edit only re-wraps the changed ones.
+    rows = [Row('title', section.titulo, 0, True, keeps=True), gap(1*cm)]
+
+    if section.campo == 'habilidades':
+        # Skills are drawn at y and then step down, so place them one step above
+        rows.append(gap(-0.6*cm))
+        rows.extend(Row('skill', skill, 0.6*cm, True) for skill in section.skills)
+        rows.append(gap(0.6*cm))
+
+    elif section.campo == 'experiencia':
+        for experience in section.experiences:
+            if experience.header:
+                rows.append(Row('style', 'header', 0, False))
+                rows.extend(wrap_rows(experience.header, width, font_bold, 12, LINE_HEIGHT, 'header'))
+                rows.append(gap(0.8*cm))
+
+            for bullet_text in experience.bullets:
+                text_lines = break_lines(bullet_text, width - 0.8*cm, font, 11)
+                if text_lines:
+                    # The bullet dot goes with the first line
+                    rows.append(gap(-16))
+                    rows.extend(Row('bullet' if j else 'bullet_first', line, 16, True)
+                                for j, line in enumerate(text_lines))
+                    rows.append(gap(16))
+                    rows.append(gap(0.2*cm))  # Extra space after bullet item
+
+            rows.append(gap(0.8*cm))  # Space between experience blocks
+
+    else:
+        rows.append(Row('style', 'text', 0, False))
+        rows.extend(wrap_rows(section.text, width, font, 11, 18, 'text'))
+
+    rows.append(gap(1*cm))
+    return tuple(rows)
+
+def layout_document(resume, font, font_bold):
+    # Every section's rows placed on their pages. Colours play no part, so
+    # all palettes sharing a pair of faces can draw from one layout.
+    placed = []
+    y = MARGIN_TOP
+    for section in resume.sections():
+        section_placed, y = place_rows(section_layout(section, font, font_bold, CONTENT_WIDTH),
+                                       y, MARGIN_TOP, MARGIN_BOTTOM)
+        placed.append((section.campo, section_placed))
+    return placed
+
+def draw_placed(pdf, placed, colors_palette):
+    COLORS = colors_palette
+    for row, row_y, new_page in placed:
+        if new_page:
+            start_new_page(pdf, COLORS)
+        kind = row.kind
+
+        if kind == 'title':
+            draw_section_header(pdf, row.text, row_y, colors_palette=COLORS)
+
+        elif kind == 'style' or (new_page and kind in ROW_STYLES):
+            # Text styles are set once per block, and again after a page break
+            font_key, font_size = ROW_STYLES[row.text if kind == 'style' else kind]
+            pdf.setFont(COLORS[font_key], font_size)
+            pdf.setFillColor(COLORS['text'])
+
+        if kind in ROW_STYLES:
+            pdf.drawString(SIDEBAR_WIDTH + 1*cm, row_y, row.text)
+
+        elif kind == 'skill':
+            # Yellow bullet point aligned with text baseline
+            pdf.setFillColor(COLORS['secondary'])
+            pdf.circle(SIDEBAR_WIDTH + 1.3*cm, row_y + 0.15*cm, 0.1*cm, fill=1)
+            pdf.setFont(COLORS['font'], 11)
+            pdf.setFillColor(COLORS['text'])
+            pdf.drawString(SIDEBAR_WIDTH + 1.8*cm, row_y, row.text)
+
+        elif kind in ('bullet_first', 'bullet'):
+            if kind == 'bullet_first':
+                pdf.setFillColor(COLORS['secondary'])
+                pdf.circle(SIDEBAR_WIDTH + 1.3*cm, row_y + 0.1*cm, 0.08*cm, fill=1)
+            pdf.setFont(COLORS['font'], 11)
+            pdf.setFillColor(COLORS['text'])
+            pdf.drawString(SIDEBAR_WIDTH + 1.8*cm, row_y, row.text)
+
+def palette_css(palette):
+    # '#rrggbb' strings for the HTML preview
+    return {role: '#' + color.hexval()[2:] for role, color in palette.items()
+            if hasattr(color, 'hexval')}
+
+def download_name(resume):
+    return f"curriculo_profissional_{resume.contact.nome.replace(' ', '_')}.pdf"
+
+# Estimated cost of a render for admission control, in units of roughly 10 ms
+# of CPU (benchmarks/bench_render.py): the fixed part of a document, each
+# experience's wrapped and drawn bullets, and decoding and masking a photo.
+BASE_COST = 0.5
+EXPERIENCE_COST = 0.1
+PHOTO_COST = 1.5
+
+def render_cost(resume, photo_bytes=None, copies=1):
+    # `copies` is how many palettes are drawn; the photo is processed once
+    cost = copies * (BASE_COST + EXPERIENCE_COST * len(resume.experiences))
+    if photo_bytes:
+        cost += PHOTO_COST
+    return cost
+
+def render_pdf(resume, photo_bytes=None):
+    buffer = io.BytesIO()
+    render_pdf_to(buffer, resume, photo_bytes)
+    return buffer.getvalue()
+
+def render_palette_sheet(resume, photo_bytes=None, palettes=None):
+    buffer = io.BytesIO()
+    render_palette_sheet_to(buffer, resume, photo_bytes, palettes)
+    return buffer.getvalue()
+
+def document_photo(resume, photo_bytes, colors_palette):
+    if not photo_bytes:
+        return None
+    with STAGE_SECONDS.time(stage='photo'):
+        if resume.compacto:
+            _, image = photo_store.compact_image(photo_bytes, colors_palette['text'].hexval()[2:])
+        else:
+            _, image = photo_store.circle_image(photo_bytes)
+    return ImageReader(io.BytesIO(image))
+
+def render_pdf_to(output, resume, photo_bytes=None):
+    # `output` is any writable binary file object
+    COLORS = document_palette(resume.paleta or 'professional', resume.texts())
+    foto = document_photo(resume, photo_bytes, COLORS)
+    with STAGE_SECONDS.time(stage='layout'):
+        placed = layout_document(resume, COLORS['font'], COLORS['font_bold'])
+    draw_document(output, resume, placed, COLORS, foto)
+
+def render_palettes(resume, photo_bytes=None, palettes=None):
+    # The same resume in several palettes, as (palette, pdf_bytes). Text is
+    # measured, wrapped and paginated once per pair of faces and the photo
+    # decoded once per background colour; only the drawing is repeated.
+    texts = list(resume.texts())
+    layouts = {}
+    photos = {}
+    for palette_name in palettes or COLOR_PALETTES:
+        COLORS = document_palette(palette_name, texts)
+        faces = (COLORS['font'], COLORS['font_bold'])
+        if faces not in layouts:
+            with STAGE_SECONDS.time(stage='layout'):
+                layouts[faces] = layout_document(resume, *faces)
+        background = COLORS['text'].hexval() if resume.compacto else ''
+        if background not in photos:
+            photos[background] = document_photo(resume, photo_bytes, COLORS)
+
+        buffer = io.BytesIO()
+        draw_document(buffer, replace(resume, paleta=palette_name), layouts[faces], COLORS, photos[background])
+        yield palette_name, buffer.getvalue()
+
+# Colour layers of a page body. Each is drawn once per page into a form
+# XObject without colour operators; a form takes the fill colour of the page
+# that uses it, so every palette reuses the same forms. Strokes (header
+# rules and the outline of the bullet dots) are always primary.
+LAYERS = ('text', 'secondary', 'primary')
+
+def page_rows(placed):
+    # Splits a document layout into pages of (row, y)
+    pages = [[]]
+    for _, section_placed in placed:
+        for row, row_y, new_page in section_placed:
+            if new_page:
+                pages.append([])
+            pages[-1].append((row, row_y))
+    return pages
+
+def draw_layer(pdf, rows, layer, font, font_bold):
+    current_font = None
+    def set_font(face, size):
+        nonlocal current_font
+        if current_font != (face, size):
+            pdf.setFont(face, size)
+            current_font = (face, size)
+
+    if layer != 'text':
+        pdf.setLineWidth(1)
+    for row, row_y in rows:
+        kind = row.kind
+        if kind == 'title' and layer == 'primary':
+            x = SIDEBAR_WIDTH + 1*cm
+            set_font(font_bold, 14)
+            pdf.drawString(x, row_y, row.text)
+            pdf.line(x, row_y-0.3*cm, x + string_width(row.text, font_bold, 14) + 1*cm, row_y-0.3*cm)
+        elif layer == 'text' and kind in ROW_STYLES:
+            font_key, font_size = ROW_STYLES[kind]
+            set_font(font if font_key == 'font' else font_bold, font_size)
+            pdf.drawString(SIDEBAR_WIDTH + 1*cm, row_y, row.text)
+        elif layer == 'text' and kind in ('skill', 'bullet_first', 'bullet'):
+            set_font(font, 11)
+            pdf.drawString(SIDEBAR_WIDTH + 1.8*cm, row_y, row.text)
+        elif layer == 'secondary' and kind == 'skill':
+            pdf.circle(SIDEBAR_WIDTH + 1.3*cm, row_y + 0.15*cm, 0.1*cm, fill=1)
+        elif layer == 'secondary' and kind == 'bullet_first':
+            pdf.circle(SIDEBAR_WIDTH + 1.3*cm, row_y + 0.1*cm, 0.08*cm, fill=1)
+
+def render_palette_sheet_to(output, resume, photo_bytes=None, palettes=None):
+    # Every palette in one PDF, one after the other with an outline entry
+    # each. Page bodies are laid out and drawn once per pair of faces as
+    # colourless layer forms; per palette only the sidebar and a few colour
+    # operators are emitted, so the whole sheet costs about one render.
+    texts = list(resume.texts())
+    pdf = canvas.Canvas(output, pagesize=A4, pageCompression=1)
+    pdf.setTitle(f"Currículo Profissional - {resume.contact.nome or 'Candidato'}")
+    pdf.setAuthor(resume.contact.nome)
+    pdf.setSubject("Currículo Profissional - Comparação de paletas")
+
+    forms = {}
+    photos = {}
+    for palette_name in palettes or COLOR_PALETTES:
+        COLORS = document_palette(palette_name, texts)
+        faces = (COLORS['font'], COLORS['font_bold'])
+        if faces not in forms:
+            with STAGE_SECONDS.time(stage='layout'):
+                pages = page_rows(layout_document(resume, *faces))
+            forms[faces] = []
+            for page_number, rows in enumerate(pages):
+                names = {}
+                for layer in LAYERS:
+                    names[layer] = f"P{len(forms)}_{page_number}_{layer}"
+                    pdf.beginForm(names[layer])
+                    draw_layer(pdf, rows, layer, *faces)
+                    pdf.endForm()
+                forms[faces].append(names)
+        background = COLORS['text'].hexval() if resume.compacto else ''
+        if background not in photos:
+            photos[background] = document_photo(resume, photo_bytes, COLORS)
+
+        for page_number, names in enumerate(forms[faces]):
+            if page_number == 0:
+                pdf.bookmarkPage(palette_name)
+                pdf.addOutlineEntry(PALETTE_LABELS.get(palette_name, palette_name), palette_name)
+                draw_sidebar(pdf, foto=photos[background], contact=resume.contact, colors_palette=COLORS)
+            else:
+                draw_sidebar(pdf, foto=None, contact=None, colors_palette=COLORS)
+            pdf.setStrokeColor(COLORS['primary'])
+            for layer in LAYERS:
+                pdf.setFillColor(COLORS[layer])
+                pdf.doForm(names[layer])
+            pdf.showPage()
+        PAGES.inc(len(forms[faces]))
+
+    pdf.showOutline()
+    with STAGE_SECONDS.time(stage='save'):
+        pdf.save()
+    size = output.tell()
+    PDF_SIZE.observe(size, mode='palettes')
+    logger.debug("Rendered palette sheet, %d bytes", size)
+
+def draw_document(output, resume, placed, colors_palette, foto=None):
+    COLORS = colors_palette
+
+    # The document's own font as the initial one, so a Unicode document does
+    # not carry an unused Helvetica resource
+    pdf = canvas.Canvas(output, pagesize=A4, pageCompression=1, initialFontName=COLORS['font'])
+    
+    pdf.setTitle(f"Currículo Profissional - {resume.contact.nome or 'Candidato'}")
+    pdf.setAuthor(resume.contact.nome)
+    pdf.setSubject("Currículo Profissional - Desenvolvido com Design Moderno")
+
+    with STAGE_SECONDS.time(stage='sidebar'):
+        draw_sidebar(pdf, foto=foto, contact=resume.contact, colors_palette=COLORS)
+
+    for campo, section_placed in placed:
+        with STAGE_SECONDS.time(stage=f'section_{campo}'):
+            draw_placed(pdf, section_placed, COLORS)
+
+    PAGES.inc(pdf.getPageNumber())
+    pdf.showPage()
+    with STAGE_SECONDS.time(stage='save'):
+        pdf.save()
+    size = output.tell()
+    PDF_SIZE.observe(size, mode='compact' if resume.compacto else 'default')
+    logger.debug("Rendered %d bytes (%s)", size, 'compact' if resume.compacto else 'default')
+
+PALETTE_LABELS = {
+    'professional': 'Profissional',
+    'corporate': 'Corporativo',
+    'modern': 'Moderno',
+    'elegant': 'Elegante',
+}
+
+def get_colors(palette_name='professional'):
+    return COLOR_PALETTES.get(palette_name, COLOR_PALETTES['professional'])
+
+def document_palette(palette_name='professional', texts=()):
+    # The palette plus the faces this document draws with: the palette's
+    # font family, or a Unicode family if the text needs one
+    palette = get_colors(palette_name)
+    font, font_bold = document_faces(palette['font_family'], texts)
+    return dict(palette, font=font, font_bold=font_bold)
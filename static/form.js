@@ -0,0 +1,128 @@
+// Preview de habilidades em tempo real
+const habilidadesInput = document.getElementById('habilidades');
+const skillsPreview = document.getElementById('skillsPreview');
+
+habilidadesInput.addEventListener('input', function() {
+  const skills = this.value.split(',').map(skill => skill.trim()).filter(skill => skill);
+  skillsPreview.innerHTML = '';
+
+  skills.forEach(skill => {
+    if (skill) {
+      const tag = document.createElement('span');
+      tag.className = 'skill-tag';
+      tag.textContent = skill;
+      skillsPreview.appendChild(tag);
+    }
+  });
+});
+
+// Feedback visual para upload de arquivo
+const fileInput = document.getElementById('foto');
+const fileDisplay = document.querySelector('.file-input-display');
+
+fileInput.addEventListener('change', function() {
+  if (this.files && this.files[0]) {
+    fileDisplay.innerHTML = `
+      <svg width="20" height="20" fill="none" stroke="currentColor" viewBox="0 0 24 24">
+        <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M5 13l4 4L19 7"></path>
+      </svg>
+      ${this.files[0].name}
+    `;
+    fileDisplay.style.background = '#dcfce7';
+    fileDisplay.style.borderColor = '#16a34a';
+    fileDisplay.style.color = '#16a34a';
+  }
+});
+
+let experienceCount = 3;
+const addExperienceBtn = document.getElementById('addExperienceBtn');
+const experienciasContainer = document.getElementById('experienciasContainer');
+
+addExperienceBtn.addEventListener('click', function() {
+  experienceCount++;
+
+  const newExperienceHTML = `
+    <div class="experiencia-item" style="background: #f1f5f9; padding: 1.5rem; border-radius: 12px; margin-bottom: 1rem; border: 1px solid #cbd5e1;">
+      <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 1rem;">
+        <h4 style="color: #1e293b; font-weight: 600;">Experiência ${experienceCount} (Opcional)</h4>
+        <button type="button" class="remove-experience" style="background: #ef4444; color: white; border: none; padding: 0.5rem; border-radius: 6px; cursor: pointer; font-size: 0.875rem;">
+          <svg width="16" height="16" fill="none" stroke="currentColor" viewBox="0 0 24 24">
+            <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M19 7l-.867 12.142A2 2 0 0116.138 21H7.862a2 2 0 01-1.995-1.858L5 7m5 4v6m4-6v6m1-10V4a1 1 0 00-1-1h-4a1 1 0 00-1 1v3M4 7h16"></path>
+          </svg>
+        </button>
+      </div>
+
+      <div class="form-grid">
+        <div class="form-group">
+          <label for="empresa${experienceCount}">Empresa</label>
+          <input type="text" id="empresa${experienceCount}" name="empresa${experienceCount}" placeholder="Nome da empresa">
+        </div>
+
+        <div class="form-group">
+          <label for="cargo${experienceCount}">Cargo</label>
+          <input type="text" id="cargo${experienceCount}" name="cargo${experienceCount}" placeholder="Seu cargo na empresa">
+        </div>
+      </div>
+
+      <div class="form-group">
+        <label for="periodo${experienceCount}">Período</label>
+        <input type="text" id="periodo${experienceCount}" name="periodo${experienceCount}" placeholder="Jan 2014 - Dez 2015">
+      </div>
+
+      <div class="form-group">
+        <label for="responsabilidades${experienceCount}">Principais Responsabilidades</label>
+        <textarea id="responsabilidades${experienceCount}" name="responsabilidades${experienceCount}" rows="3" placeholder="• Suas principais responsabilidades\n• Uma responsabilidade por linha\n• Use bullets para organizar"></textarea>
+      </div>
+
+      <div class="form-group">
+        <label for="conquistas${experienceCount}">Conquistas e Resultados</label>
+        <textarea id="conquistas${experienceCount}" name="conquistas${experienceCount}" rows="3" placeholder="• Suas principais conquistas\n• Resultados quantificáveis quando possível\n• Use bullets para organizar"></textarea>
+      </div>
+    </div>
+  `;
+
+  experienciasContainer.insertAdjacentHTML('beforeend', newExperienceHTML);
+
+  // Add event listener to the new remove button
+  const newRemoveBtn = experienciasContainer.lastElementChild.querySelector('.remove-experience');
+  newRemoveBtn.addEventListener('click', function() {
+    this.closest('.experiencia-item').remove();
+  });
+});
+
+// Add remove functionality to existing experiences (except the first one)
+document.addEventListener('click', function(e) {
+  if (e.target.closest('.remove-experience')) {
+    e.target.closest('.experiencia-item').remove();
+    schedulePreview();
+  }
+});
+
+// Pré-visualização: reenvia o formulário (sem a foto) quando a digitação pausa
+const resumeForm = document.querySelector('form');
+const previewFrame = document.getElementById('previewFrame');
+let previewTimer = null;
+let previewController = null;
+
+function schedulePreview() {
+  clearTimeout(previewTimer);
+  previewTimer = setTimeout(updatePreview, 400);
+}
+
+function updatePreview() {
+  const formData = new FormData(resumeForm);
+  formData.delete('foto');
+  // Drop a response that is still on its way; only the latest one matters
+  if (previewController) {
+    previewController.abort();
+  }
+  previewController = new AbortController();
+  fetch('/preview', { method: 'POST', body: formData, signal: previewController.signal })
+    .then(response => response.ok ? response.text() : Promise.reject(response.status))
+    .then(html => { previewFrame.srcdoc = html; })
+    .catch(() => {});
+}
+
+resumeForm.addEventListener('input', schedulePreview);
+resumeForm.addEventListener('change', schedulePreview);
+updatePreview();
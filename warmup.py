@@ -0,0 +1,78 @@
+# Pays the first-request costs once, before gunicorn forks: font width tables,
+# palette colours, compiled templates and the lazily imported parts of
+# ReportLab and PIL. Workers forked afterwards share these pages copy-on-write.
+import gc
+import io
+import logging
+import time
+
+from PIL import Image
+
+import render
+from fonts import UNICODE_FAMILIES, family_faces
+from layout import space_width, word_width
+from metrics import REGISTRY, STARTUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+FONT_SIZES = (9, 10, 11, 12, 14, 18)
+TEMPLATES = ('form.html', 'curriculo.html')
+
+
+def warm_fonts():
+    # Registers the palette and Unicode fallback fonts, loads their width
+    # tables and fills the layout engine's width caches with the characters
+    # Portuguese resumes use most
+    alphabet = 'abcdefghijklmnopqrstuvwxyzçãõáéíóúâêôà'
+    families = {palette['font_family'] for palette in render.COLOR_PALETTES.values()}
+    faces = [face for family in sorted(families) + list(UNICODE_FAMILIES) for face in family_faces(family)]
+    for font_name in dict.fromkeys(faces):
+        for font_size in FONT_SIZES:
+            space_width(font_name, font_size)
+            for char in alphabet + alphabet.upper():
+                word_width(char, font_name, font_size)
+
+
+def warm_templates(app):
+    for name in TEMPLATES:
+        app.jinja_env.get_template(name)
+
+
+def warm_render():
+    # A throwaway render with a tiny photo touches every drawing path and the
+    # PIL plugins; it goes straight to render_pdf_to so no cache is populated
+    photo = io.BytesIO()
+    Image.new('RGB', (64, 64), (128, 128, 128)).save(photo, 'JPEG')
+    render.create_circle_image(photo.getvalue())
+    for palette in render.COLOR_PALETTES:
+        data = render.parse_form_data({
+            'nome': 'Aquecimento', 'email': 'a@b.c', 'resumo': 'Texto de aquecimento.',
+            'habilidades': 'Python, Flask', 'empresa1': 'Empresa', 'cargo1': 'Cargo',
+            'responsabilidades1': 'Responsabilidade', 'paleta': palette,
+        })
+        render.render_pdf_to(io.BytesIO(), data)
+
+
+def warm_up(app, import_seconds=None):
+    started = time.perf_counter()
+    warm_fonts()
+    warm_templates(app)
+    warm_render()
+    elapsed = time.perf_counter() - started
+
+    # The warm-up render must not show up in every worker's metrics. Its
+    # layouts are of no use to real requests, so those caches start empty.
+    REGISTRY.reset()
+    render.section_layout.cache_clear()
+    render.fit_name.cache_clear()
+    STARTUP_SECONDS.set(elapsed, phase='warmup')
+    if import_seconds is not None:
+        STARTUP_SECONDS.set(import_seconds, phase='import')
+    logger.info("Warm-up finished in %.1f ms (app import %.1f ms)",
+                   elapsed * 1000, (import_seconds or 0) * 1000)
+
+    # Keep the warmed objects out of future collections so the GC does not
+    # touch (and un-share) their pages in the forked workers
+    gc.collect()
+    gc.freeze()
+    return elapsed